@@ -0,0 +1,252 @@
+"""
+Benchmarks for the tree generation backend.
+
+Builds reproducible synthetic trees (see fixtures.py) and, for every
+fixture and output mode, measures entries per second, file system calls per
+entry and peak Python memory. Results are written as JSON; pass an earlier
+results file with --compare to see the change between runs.
+
+    python benchmarks/bench_backend.py
+    python benchmarks/bench_backend.py --scale 0.1 --fixtures wide deep
+    python benchmarks/bench_backend.py --compare old.json --output new.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from fixtures import FIXTURES, ensure_fixture, scaled_params
+from backend.generate_tree import TreeConfig, iter_tree_lines, generate_directory_tree, write_tree_file
+from backend.export import export_tree
+
+# Output mode -> setting overrides; every mode expands the whole tree
+MODES = {
+    "lines": {},  # Consume iter_tree_lines
+    "string": {},  # generate_directory_tree building the full text
+    "file": {},  # write_tree_file streaming to disk
+    "ndjson": {},  # export_tree writing NDJSON records (one stat per entry for mtime)
+    "sizes": {"show_sizes": True},  # Size rollups shown on every line
+    "parallel": {"scan_workers": 4},  # Listing subdirectories on 4 threads
+    "cache_warm": {"use_scan_cache": True},  # Scan cache primed by an earlier run
+}
+
+def run_mode(mode, root, config, scratch):
+    """Run one traversal in the given mode and return the number of entries produced."""
+    if mode == "string":
+        return generate_directory_tree(root, None, config).count("\n") - 1
+    if mode == "file":
+        return write_tree_file(root, os.path.join(scratch, "tree.txt"), config) - 1
+    if mode == "ndjson":
+        return export_tree(root, os.path.join(scratch, "tree.ndjson"), "ndjson", config) - 1
+    count = 0
+    for _ in iter_tree_lines(root, config):
+        count += 1
+    # The root line is not an entry
+    return count - 1
+
+class SyscallCounter:
+    """
+    Counts directory listings and stat calls made through the os module.
+
+    os.scandir is wrapped so that the first stat() of every DirEntry is
+    counted too (DirEntry caches the result, so later calls are free). Type
+    checks answered from the directory listing are not system calls and are
+    not counted.
+    """
+
+    def __init__(self):
+        self.scandir = 0
+        self.stat = 0
+        self._saved = None
+
+    def __enter__(self):
+        counter = self
+        real_scandir, real_stat, real_lstat = os.scandir, os.stat, os.lstat
+
+        class CountingEntry:
+            __slots__ = ("_entry", "_stat_counted", "name", "path")
+
+            def __init__(self, entry):
+                self._entry = entry
+                self._stat_counted = False
+                self.name = entry.name
+                self.path = entry.path
+
+            def stat(self, **kwargs):
+                if not self._stat_counted:
+                    self._stat_counted = True
+                    counter.stat += 1
+                return self._entry.stat(**kwargs)
+
+            def is_dir(self, **kwargs):
+                return self._entry.is_dir(**kwargs)
+
+            def is_file(self, **kwargs):
+                return self._entry.is_file(**kwargs)
+
+            def is_symlink(self):
+                return self._entry.is_symlink()
+
+            def inode(self):
+                return self._entry.inode()
+
+        class CountingScandir:
+            def __init__(self, path):
+                counter.scandir += 1
+                self._it = real_scandir(path)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self._it.close()
+
+            def __iter__(self):
+                return (CountingEntry(entry) for entry in self._it)
+
+        def counting_stat(*args, **kwargs):
+            counter.stat += 1
+            return real_stat(*args, **kwargs)
+
+        def counting_lstat(*args, **kwargs):
+            counter.stat += 1
+            return real_lstat(*args, **kwargs)
+
+        self._saved = (real_scandir, real_stat, real_lstat)
+        os.scandir, os.stat, os.lstat = CountingScandir, counting_stat, counting_lstat
+        return self
+
+    def __exit__(self, *exc):
+        os.scandir, os.stat, os.lstat = self._saved
+
+def bench(fixture, mode, root, overrides, repeat, scratch):
+    settings = dict(overrides)
+    settings.update(MODES[mode])
+    settings["tree_depth"] = -1
+    if settings.get("use_scan_cache"):
+        settings["scan_cache_path"] = os.path.join(scratch, f"{fixture}-scan-cache.bin")
+    config = TreeConfig.from_settings(settings)
+    if settings.get("use_scan_cache"):
+        run_mode(mode, root, config, scratch)  # Prime the cache
+
+    # Timing runs, without any instrumentation
+    times = []
+    entries = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        entries = run_mode(mode, root, config, scratch)
+        times.append(time.perf_counter() - start)
+    best = min(times)
+
+    with SyscallCounter() as counter:
+        run_mode(mode, root, config, scratch)
+
+    tracemalloc.start()
+    try:
+        run_mode(mode, root, config, scratch)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    syscalls = counter.scandir + counter.stat
+    return {
+        "fixture": fixture,
+        "mode": mode,
+        "entries": entries,
+        "seconds": round(best, 6),
+        "seconds_all": [round(t, 6) for t in times],
+        "entries_per_sec": round(entries / best, 1) if best > 0 else None,
+        "syscalls": {
+            "scandir": counter.scandir,
+            "stat": counter.stat,
+            "per_entry": round(syscalls / entries, 4) if entries else None,
+        },
+        "peak_memory_bytes": peak,
+    }
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def compare(results, baseline_path):
+    """Print the change in entries/sec and syscalls per entry against an earlier results file."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["fixture"], r["mode"]): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    print(f"  {'fixture':<12}{'mode':<12}{'entries/s':>14}{'change':>10}{'syscalls/entry':>18}")
+    for result in results:
+        old = baseline.get((result["fixture"], result["mode"]))
+        if old is None or not old.get("entries_per_sec") or not result["entries_per_sec"]:
+            continue
+        change = result["entries_per_sec"] / old["entries_per_sec"] - 1
+        calls = f"{old['syscalls']['per_entry']} -> {result['syscalls']['per_entry']}"
+        print(f"  {result['fixture']:<12}{result['mode']:<12}{result['entries_per_sec']:>14,.0f}{change:>+10.1%}{calls:>18}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the directory tree backend on synthetic trees.")
+    parser.add_argument("--fixtures", nargs="+", choices=list(FIXTURES), default=list(FIXTURES))
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Multiply fixture sizes (e.g. 0.1 for a quick run; default 1)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark; the best is kept")
+    parser.add_argument("--fixture-dir", default=os.path.join(tempfile.gettempdir(), "dtg-bench-fixtures"),
+                        help="Where fixtures are built and kept between runs")
+    parser.add_argument("--output", default="benchmark-results.json", help="JSON results file")
+    parser.add_argument("--compare", metavar="FILE", help="Earlier results file to compare with")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="dtg-bench-") as scratch:
+        for fixture in args.fixtures:
+            start = time.perf_counter()
+            try:
+                root = ensure_fixture(fixture, args.fixture_dir, args.scale)
+            except OSError as e:
+                # e.g. the deep fixture on Windows without long path support
+                print(f"{fixture}: skipped, cannot build fixture ({e})", file=sys.stderr)
+                continue
+            print(f"{fixture}: fixture ready in {time.perf_counter() - start:.1f}s ({root})")
+            overrides = FIXTURES[fixture][2]
+            for mode in args.modes:
+                result = bench(fixture, mode, root, overrides, max(1, args.repeat), scratch)
+                results.append(result)
+                print(f"  {mode:<12}{result['entries']:>10,} entries  {result['entries_per_sec']:>12,.0f}/s  "
+                      f"{result['syscalls']['per_entry']} syscalls/entry  "
+                      f"peak {result['peak_memory_bytes'] / 1e6:.1f} MB")
+
+    document = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "repeat": args.repeat,
+            "fixtures": {name: scaled_params(name, args.scale) for name in args.fixtures},
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import os
+import json
+import random
+import shutil
+
+# Reproducible synthetic directory trees for the benchmarks. Every fixture is
+# generated from a fixed seed, so two machines (or two releases) scan exactly
+# the same tree. A marker file records the parameters a fixture was built
+# with; a fixture is only rebuilt when they change.
+
+MARKER = ".fixture.json"
+
+def _touch(path, size=0):
+    with open(path, "wb") as f:
+        if size:
+            f.write(b"\0" * size)
+
+def build_wide(path, files=100_000):
+    """One directory holding `files` small files."""
+    rng = random.Random(1)
+    extensions = (".txt", ".py", ".json", ".md", ".log", ".csv")
+    for i in range(files):
+        _touch(os.path.join(path, f"file_{i:06d}{rng.choice(extensions)}"), rng.randrange(0, 64))
+
+def build_deep(path, levels=1000):
+    """A chain of `levels` nested directories with two files at every level."""
+    current = path
+    for level in range(levels):
+        _touch(os.path.join(current, "a.txt"), 1)
+        _touch(os.path.join(current, "b.py"), 1)
+        current = os.path.join(current, "d")
+        os.mkdir(current)
+
+def build_monorepo(path, packages=60):
+    """
+    A monorepo-shaped tree: packages with nested sources and tests, vendored
+    node_modules, build output, a .git directory and the usual top-level files.
+    """
+    rng = random.Random(3)
+    for name in ("README.md", "package.json", "pyproject.toml", ".gitignore", "LICENSE"):
+        _touch(os.path.join(path, name), 100)
+    git = os.path.join(path, ".git", "objects")
+    for i in range(64):
+        bucket = os.path.join(git, f"{i:02x}")
+        os.makedirs(bucket)
+        for j in range(rng.randrange(5, 30)):
+            _touch(os.path.join(bucket, f"{rng.getrandbits(64):016x}"), rng.randrange(50, 5000))
+    for p in range(packages):
+        package = os.path.join(path, "packages", f"pkg-{p:03d}")
+        for sub in ("src", "tests", "docs"):
+            depth = rng.randrange(1, 5)
+            directory = os.path.join(package, sub, *[f"mod{d}" for d in range(depth)])
+            os.makedirs(directory)
+            parts = [os.path.join(package, sub)] + [
+                os.path.join(package, sub, *[f"mod{d}" for d in range(k + 1)]) for k in range(depth)
+            ]
+            for part in parts:
+                for f in range(rng.randrange(3, 15)):
+                    ext = rng.choice((".py", ".ts", ".tsx", ".md", ".json", ".pyc"))
+                    _touch(os.path.join(part, f"file{f}{ext}"), rng.randrange(0, 20_000))
+        modules = os.path.join(package, "node_modules")
+        for m in range(rng.randrange(5, 20)):
+            module = os.path.join(modules, f"dep{m}", "lib")
+            os.makedirs(module)
+            for f in range(rng.randrange(2, 10)):
+                _touch(os.path.join(module, f"index{f}.js"), rng.randrange(100, 4000))
+        build = os.path.join(package, "build")
+        os.makedirs(build)
+        for f in range(rng.randrange(2, 10)):
+            _touch(os.path.join(build, f"bundle{f}.js"), rng.randrange(1000, 50_000))
+        _touch(os.path.join(package, "package.json"), 200)
+
+def rules_heavy_rules(count=300):
+    """`count` directory rules of every type, targeting the directories of build_rules_heavy."""
+    rng = random.Random(4)
+    types = ("exclude_folder", "exclude_file", "exclude_file_and_folder")
+    rules = []
+    for i in range(count):
+        rules.append({
+            "directory": f"area{rng.randrange(0, 40):02d}",
+            "type": types[i % len(types)],
+            "pattern": rng.choice(("tmp*", "*.bak", "cache", "gen_*", "*_old", f"x{i}*", "*.min.js")),
+            "recursive": False,
+        })
+    return rules
+
+def build_rules_heavy(path, areas=40, files_per_dir=40):
+    """A moderately sized tree whose names are matched by rules_heavy_rules()."""
+    rng = random.Random(5)
+    names = ("tmp", "gen_", "keep", "src", "x1", "lib")
+    suffixes = (".bak", ".min.js", ".py", ".txt", "_old")
+    for a in range(areas):
+        area = os.path.join(path, f"area{a:02d}")
+        for d in range(8):
+            directory = os.path.join(area, f"{rng.choice(names)}{d}", f"area{rng.randrange(0, areas):02d}")
+            os.makedirs(directory, exist_ok=True)
+            for f in range(files_per_dir):
+                _touch(os.path.join(directory, f"{rng.choice(names)}{f}{rng.choice(suffixes)}"))
+
+# Fixture name -> (builder, builder parameters, setting overrides the benchmarks run with)
+FIXTURES = {
+    "wide": (build_wide, {"files": 100_000}, {"exclude_extensions": []}),
+    "deep": (build_deep, {"levels": 1000}, {}),
+    "monorepo": (build_monorepo, {"packages": 60}, {}),
+    "rules_heavy": (build_rules_heavy, {"areas": 40, "files_per_dir": 40}, {"directory_rules": rules_heavy_rules(300)}),
+}
+
+def scaled_params(name, scale):
+    """Builder parameters for a fixture, with every count multiplied by scale."""
+    params = FIXTURES[name][1]
+    return {key: max(1, int(value * scale)) for key, value in params.items()}
+
+def ensure_fixture(name, base_dir, scale=1.0):
+    """
+    Build a fixture under base_dir unless an identical one is already there.
+
+    Args:
+        name (str): One of FIXTURES
+        base_dir (str): Directory holding the fixtures
+        scale (float): Multiplier for the fixture's size parameters
+
+    Returns:
+        str: The root directory of the fixture
+    """
+    builder = FIXTURES[name][0]
+    params = scaled_params(name, scale)
+    root = os.path.join(base_dir, name)
+    marker = os.path.join(base_dir, f"{name}{MARKER}")
+    try:
+        with open(marker, encoding="utf-8") as f:
+            if json.load(f) == params and os.path.isdir(root):
+                return root
+    except (OSError, ValueError):
+        pass
+    shutil.rmtree(root, ignore_errors=True)
+    os.makedirs(root)
+    builder(root, **params)
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump(params, f)
+    return root
@@ -0,0 +1,4 @@
+import sys
+from backend.cli import main
+
+sys.exit(main())
@@ -0,0 +1,249 @@
+import os
+import sys
+import json
+import argparse
+from backend.generate_tree import (
+    SORT_MODES, TreeConfig, TreeStats, TREE_STYLES, iter_tree_lines, iter_tree_records, iter_batch_results, parse_tree_depth,
+    write_lines,
+)
+from backend.export import EXPORT_FORMATS, export_tree, write_records
+
+# Command-line interface for the tree generator. Only the backend is imported
+# here (never Qt), so it starts quickly enough to be called from CI and cron.
+
+def _depth(value):
+    try:
+        depth = parse_tree_depth(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid depth: {value!r} (use a number or 'all')")
+    return -1 if depth == float("inf") else depth
+
+def _size(value):
+    if value.strip().lower() == "inf":
+        return float("inf")
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size in bytes: {value!r}")
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m backend",
+        description="Generate a directory tree without starting the GUI.",
+    )
+    parser.add_argument("roots", nargs="*", default=["."], metavar="ROOT",
+                        help="Directories to generate trees for (default: current directory)")
+    parser.add_argument("-d", "--depth", type=_depth, default=None,
+                        help="Levels of subdirectories to show; 'all' for unlimited (default: 1)")
+    parser.add_argument("-r", "--rules", metavar="FILE",
+                        help="JSON file with settings (same keys as the backend settings, plus "
+                             "\"directory_rules\"), or a JSON list of directory rules")
+    parser.add_argument("-f", "--format", choices=list(EXPORT_FORMATS), default="text",
+                        help="Output format: the text tree, or one record per entry as ndjson/csv, "
+                             "or a nested json document (default: text)")
+    parser.add_argument("-o", "--output", metavar="FILE",
+                        help="Write the tree to FILE instead of standard output (single root only)")
+    parser.add_argument("--output-dir", metavar="DIR",
+                        help="Write one file per root into DIR (named after the root directory)")
+
+    filters = parser.add_argument_group("filters")
+    filters.add_argument("--no-files", action="store_true", help="Show directories only")
+    filters.add_argument("--no-subdir-files", action="store_true",
+                         help="Show files in the root directory only")
+    filters.add_argument("--no-sort", action="store_true", help="Keep directory listing order")
+    filters.add_argument("--exclude-folder", action="append", default=[], metavar="NAME",
+                         help="Exclude folders with this name (repeatable; added to the defaults)")
+    filters.add_argument("--exclude-pattern", action="append", default=[], metavar="PREFIX",
+                         help="Exclude files and folders starting with PREFIX (repeatable)")
+    filters.add_argument("--exclude-ext", action="append", default=[], metavar="EXT",
+                         help="Exclude files with this extension, e.g. .log (repeatable)")
+    filters.add_argument("--min-size", type=_size, metavar="BYTES", help="Minimum file size")
+    filters.add_argument("--max-size", type=_size, metavar="BYTES", help="Maximum file size ('inf' for none)")
+    filters.add_argument("--gitignore", action="store_true",
+                         help="Also skip what .gitignore / .ignore files in the tree (and up to the repository root) ignore")
+
+    display = parser.add_argument_group("display")
+    display.add_argument("--style", choices=list(TREE_STYLES),
+                         help="Line style: box drawing (default), ascii, a markdown list or plain indentation")
+    display.add_argument("--no-emoji", action="store_true", help="Omit the root and folder emoji")
+    display.add_argument("--sizes", action="store_true",
+                         help="Show cumulative folder sizes and file counts (and file sizes); "
+                              "record formats get folder totals in their size field")
+    display.add_argument("--sort", choices=SORT_MODES, metavar="MODE",
+                         help="Order within each folder: name (default), natural, extension, "
+                              "size (largest first) or mtime (newest first)")
+    display.add_argument("--reverse", action="store_true", help="Reverse the sort order")
+    display.add_argument("--sort-size", action="store_true", help="Same as --sort size")
+    display.add_argument("--max-entries", type=int, metavar="N",
+                         help="Show at most N entries per folder and summarise the rest on one line (0 = no limit)")
+
+    performance = parser.add_argument_group("performance")
+    performance.add_argument("-j", "--jobs", type=int, metavar="N",
+                             help="Threads listing directories concurrently within one tree (default: 0)")
+    performance.add_argument("--batch-jobs", type=int, default=4, metavar="N",
+                             help="Trees generated at the same time when several roots are given (default: 4)")
+    performance.add_argument("--cache", action="store_true",
+                             help="Reuse listings of unchanged directories from earlier runs")
+    performance.add_argument("--cache-file", metavar="FILE", help="Location of the scan cache")
+    performance.add_argument("--stats", action="store_true",
+                             help="Print per-phase timings and entry counters to standard error (single root)")
+    return parser
+
+def load_rules_file(path):
+    """
+    Read a rules file.
+
+    Args:
+        path (str): JSON file holding either a settings mapping or a list of directory rules
+
+    Returns:
+        dict: A settings mapping suitable for TreeConfig.from_settings
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return {"directory_rules": data}
+    if not isinstance(data, dict):
+        raise ValueError("rules file must contain a JSON object or list")
+    return data
+
+def config_from_args(args):
+    """Build the TreeConfig described by the parsed command-line arguments."""
+    settings = load_rules_file(args.rules) if args.rules else {}
+    config = TreeConfig.from_settings(settings)
+    changes = {}
+    if args.depth is not None:
+        changes["tree_depth"] = args.depth
+    if args.no_files:
+        changes["show_files"] = False
+    if args.no_subdir_files:
+        changes["show_subdirectory_files"] = False
+    if args.no_sort:
+        changes["sort_alphabetically"] = False
+    if args.exclude_folder:
+        changes["exclude_folders"] = list(config.exclude_folders) + args.exclude_folder
+    if args.exclude_pattern:
+        changes["exclude_patterns"] = list(config.exclude_patterns) + args.exclude_pattern
+    if args.exclude_ext:
+        changes["exclude_extensions"] = list(config.exclude_extensions) + args.exclude_ext
+    if args.min_size is not None:
+        changes["min_file_size"] = args.min_size
+    if args.max_size is not None:
+        changes["max_file_size"] = args.max_size
+    if args.gitignore:
+        changes["use_ignore_files"] = True
+    if args.style:
+        changes["tree_style"] = args.style
+    if args.no_emoji:
+        changes["root_emoji"] = ""
+        changes["subdir_emoji"] = ""
+    if args.sizes:
+        changes["show_sizes"] = True
+        changes["size_rollups"] = True
+    if args.sort_size:
+        changes["sort_by_size"] = True
+    if args.sort:
+        changes["sort_mode"] = args.sort
+    if args.reverse:
+        changes["sort_reverse"] = True
+    if args.max_entries is not None:
+        changes["max_entries_per_dir"] = max(0, args.max_entries)
+    if args.jobs is not None:
+        changes["scan_workers"] = max(0, args.jobs)
+    if args.cache or args.cache_file:
+        changes["use_scan_cache"] = True
+    if args.cache_file:
+        changes["scan_cache_path"] = args.cache_file
+    return config.replace(**changes)
+
+def _output_name(root, export_format="text"):
+    name = os.path.basename(os.path.abspath(root)) or "root"
+    return f"{name}-directory-structure{EXPORT_FORMATS[export_format][1]}"
+
+def _root_name(root):
+    return os.path.basename(os.path.abspath(root))
+
+def _print_stats(stats):
+    if stats is not None:
+        print(stats.report(), file=sys.stderr)
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.output and len(args.roots) > 1:
+        parser.error("--output takes a single root; use --output-dir for several")
+    if args.stats and len(args.roots) > 1:
+        parser.error("--stats takes a single root")
+    try:
+        config = config_from_args(args)
+    except (OSError, ValueError, KeyError) as e:
+        parser.error(f"cannot load rules: {e}")
+
+    missing = [root for root in args.roots if not os.path.isdir(root)]
+    if missing:
+        for root in missing:
+            print(f"error: not a directory: {root}", file=sys.stderr)
+        return 1
+
+    stats = TreeStats() if args.stats else None
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        if args.format != "text" or stats is not None:
+            # Record exports (and runs with --stats) are streamed one root after another
+            status = 0
+            for root in args.roots:
+                try:
+                    export_tree(root, os.path.join(args.output_dir, _output_name(root, args.format)), args.format, config, stats)
+                except (OSError, UnicodeError) as e:
+                    print(f"error: {root}: {e}", file=sys.stderr)
+                    status = 1
+            _print_stats(stats)
+            return status
+        jobs = [(root, config, os.path.join(args.output_dir, _output_name(root))) for root in args.roots]
+        status = 0
+        for result in iter_batch_results(jobs, args.batch_jobs):
+            if result.error is not None:
+                print(f"error: {result.root_dir}: {result.error}", file=sys.stderr)
+                status = 1
+        return status
+
+    if args.output:
+        try:
+            export_tree(args.roots[0], args.output, args.format, config, stats)
+        except (OSError, UnicodeError) as e:
+            print(f"error: {args.output}: {e}", file=sys.stderr)
+            return 1
+        _print_stats(stats)
+        return 0
+
+    if args.format != "text" and len(args.roots) > 1:
+        parser.error(f"--format {args.format} takes a single root on standard output; use --output-dir for several")
+
+    # UTF-8 regardless of the console code page, so the tree glyphs survive redirection
+    stdout = open(sys.stdout.fileno(), "w", encoding="utf-8", errors="replace", closefd=False,
+                  newline="" if args.format == "csv" else None)
+    try:
+        if args.format != "text":
+            write_records(iter_tree_records(args.roots[0], config, stats), stdout, args.format, _root_name(args.roots[0]))
+        elif len(args.roots) == 1:
+            write_lines(iter_tree_lines(args.roots[0], config, stats), stdout)
+        else:
+            # Generate concurrently, print in the order given
+            jobs = [(root, config) for root in args.roots]
+            for index, result in enumerate(sorted(iter_batch_results(jobs, args.batch_jobs), key=lambda r: r.index)):
+                if index:
+                    stdout.write("\n")
+                if result.error is not None:
+                    print(f"error: {result.root_dir}: {result.error}", file=sys.stderr)
+                else:
+                    stdout.write(result.text)
+    except BrokenPipeError:
+        pass
+    finally:
+        try:
+            stdout.close()
+        except BrokenPipeError:
+            pass
+    _print_stats(stats)
+    return 0
@@ -0,0 +1,165 @@
+import csv
+import json
+import os
+from backend.generate_tree import TreeConfig, iter_tree_records, write_tree_file
+
+# Machine-readable exports of the tree. Records are written as the traversal
+# produces them, so memory use does not grow with the size of the tree.
+
+RECORD_FIELDS = ("path", "depth", "type", "size", "mtime", "error", "count")
+
+def write_ndjson(records, f):
+    """
+    Write one JSON object per line.
+
+    Args:
+        records (iterable): TreeRecord objects
+        f: Text file opened for writing
+
+    Returns:
+        int: The number of records written
+    """
+    dumps = json.dumps
+    write = f.write
+    count = 0
+    for record in records:
+        item = {"path": record.path, "depth": record.depth, "type": record.type,
+                "size": record.size, "mtime": record.mtime}
+        if record.error is not None:
+            item["error"] = record.error
+        if record.count is not None:
+            item["count"] = record.count
+        write(dumps(item, ensure_ascii=False))
+        write("\n")
+        count += 1
+    return count
+
+def write_csv(records, f):
+    """
+    Write a CSV table with a header row and one row per record.
+
+    Args:
+        records (iterable): TreeRecord objects
+        f: Text file opened for writing with newline=""
+
+    Returns:
+        int: The number of records written
+    """
+    writer = csv.writer(f)
+    writer.writerow(RECORD_FIELDS)
+    writerow = writer.writerow
+    count = 0
+    for record in records:
+        writerow(record)
+        count += 1
+    return count
+
+def write_json(records, f, root_name=None):
+    """
+    Write a nested JSON document: the root object, with each expanded
+    directory holding its entries in a "children" list.
+
+    Records must come in traversal order (as from iter_tree_records); only
+    the chain of directories above the current record is kept open.
+
+    Args:
+        records (iterable): TreeRecord objects
+        f: Text file opened for writing
+        root_name (str): Name shown for the root directory (default ".")
+
+    Returns:
+        int: The number of records written
+    """
+    dumps = json.dumps
+    write = f.write
+    open_depths = []  # Depths of the directories whose "children" list is still open
+    previous = None
+    count = 0
+    for record in records:
+        if previous is not None:
+            if record.depth > previous.depth:
+                write(', "children": [\n')
+                open_depths.append(previous.depth)
+            else:
+                write("}")
+                while open_depths and open_depths[-1] >= record.depth:
+                    write("]}")
+                    open_depths.pop()
+                write(",\n")
+        if record.type == "error":
+            name = None
+        elif record.depth == 0:
+            name = root_name or record.path
+        else:
+            name = os.path.basename(record.path)
+        write(f'{{"name": {dumps(name, ensure_ascii=False)}, "path": {dumps(record.path, ensure_ascii=False)}, '
+              f'"type": "{record.type}", "size": {dumps(record.size)}, "mtime": {dumps(record.mtime)}')
+        if record.error is not None:
+            write(f', "error": {dumps(record.error, ensure_ascii=False)}')
+        if record.count is not None:
+            write(f', "count": {record.count}')
+        previous = record
+        count += 1
+    if previous is None:
+        write("null")
+    else:
+        write("}")
+        write("]}" * len(open_depths))
+    write("\n")
+    return count
+
+# Export format name -> (record writer, file extension, file dialog filter)
+EXPORT_FORMATS = {
+    "text": (None, ".txt", "Text Files (*.txt)"),
+    "ndjson": (write_ndjson, ".ndjson", "NDJSON (*.ndjson *.jsonl)"),
+    "csv": (write_csv, ".csv", "CSV Files (*.csv)"),
+    "json": (write_json, ".json", "JSON Files (*.json)"),
+}
+
+def format_for_path(path, default="text"):
+    """Return the export format matching a file name's extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".jsonl":
+        return "ndjson"
+    for name, (_, format_extension, _) in EXPORT_FORMATS.items():
+        if extension == format_extension:
+            return name
+    return default
+
+def write_records(records, f, export_format, root_name=None):
+    """Write records to an open text file in one of the record formats (ndjson, csv, json)."""
+    writer = EXPORT_FORMATS[export_format][0]
+    if writer is None:
+        raise ValueError(f"{export_format!r} is not a record format")
+    if writer is write_json:
+        return writer(records, f, root_name)
+    return writer(records, f)
+
+def export_tree(root_dir, output_file, export_format="ndjson", config=None, stats=None, scan=None):
+    """
+    Stream the directory tree into a file in the given format.
+
+    Args:
+        root_dir (str): The directory to generate the tree for
+        output_file (str): Path of the file to write
+        export_format (str): One of EXPORT_FORMATS
+        config (TreeConfig): Settings for this run, see iter_tree_lines
+        stats (TreeStats): Optional collector, see iter_tree_lines
+        scan (RetainedScan): Optional in-memory listings, see iter_tree_lines
+
+    Returns:
+        int: The number of lines (text) or records written
+
+    Raises:
+        ValueError: If the format is unknown
+        OSError: If the output file cannot be written
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format: {export_format!r}")
+    if export_format == "text":
+        return write_tree_file(root_dir, output_file, config, stats, scan)
+    settings = config if config is not None else TreeConfig()
+    # Same policy as the text output: names that are not valid UTF-8 are written as "?"
+    with open(output_file, "w", encoding="utf-8", errors="replace", newline="") as f:
+        root_name = os.path.basename(os.path.abspath(root_dir))
+        return write_records(iter_tree_records(root_dir, settings, stats, scan), f, export_format, root_name)
@@ -1,14 +1,35 @@
 import os
+import copy
 import errno
-import io
+import stat
 import fnmatch
+import re
+import sys
+import time
+import itertools
+import threading
+from collections import deque
+from collections import namedtuple
 
 # Global variables to customize the tree generation
-tree_depth = 1  # Controls how many levels of subdirectories to show (0 = root only, 1 = root + one level, 2 = root + two levels, etc.)
+tree_depth = 1  # Controls how many levels of subdirectories to show (0 = root only, 1 = root + one level, 2 = root + two levels, etc., -1 or "all" = unlimited)
 show_subdirectory_files = True  # Controls whether to show files in subdirectories (True = show all files, False = only show directories)
 sort_alphabetically = True  # Controls whether to sort files and folders alphabetically (True = sort, False = no sorting)
+sort_mode = "name"  # Order within each folder: "name", "natural" (file2 before file10), "extension", "size" (largest first) or "mtime" (newest first), folders by their totals only when size_rollups or show_sizes is on; any mode but "name" sorts even when sort_alphabetically is False
+sort_reverse = False  # Reverse the sort order
+max_entries_per_dir = 0  # Show at most this many entries per directory, then one summary line for the rest (0 = no limit); with size or mtime order but no size rollups, the entries shown are the first ones by name
+use_scan_cache = False  # Reuse directory listings from earlier runs when a directory's mtime is unchanged
+scan_cache_path = None  # Location of the scan cache file (None = per-user default, see backend.scan_cache)
+scan_cache_max_entries = 2000000  # Maximum number of directory entries kept in the scan cache
+scan_workers = 0  # Number of threads listing subdirectories concurrently (0 = sequential scan); helps on network/FUSE mounts
+
+# Size rollups (du-style): cumulative size and file count of every directory, from the same scan
+size_rollups = False  # Compute directory totals (used for exports even when not shown)
+show_sizes = False  # Show sizes on each line: totals for directories, the size for files (implies size_rollups)
+sort_by_size = False  # Same as sort_mode = "size": folders by their total, files by their size, largest first
 
 # Emoji and indentation configuration
+tree_style = "box"  # Line style: "box" (├───), "ascii" (|---), "markdown" (nested list) or "indent" (indentation only)
 root_emoji = "🌐"  # Emoji for root directory, set to "" to disable
 subdir_emoji = "📁"  # Emoji for subdirectories, set to "" to disable
 extra_indent = 0  # Number of spaces to add for items within subdirectories when emoji is enabled
@@ -76,6 +97,9 @@ exclude_extensions = [
     ".cache"         # Cache files
 ]  # File extensions to exclude
 
+use_ignore_files = False  # Also leave out whatever .gitignore / .ignore files in the tree (and above it, up to the repository root) ignore
+ignore_file_names = [".gitignore", ".ignore"]  # Ignore files read by use_ignore_files; rules in later files take precedence
+
 # File filtering options
 show_files = True  # Set to True to include files in the output, False for directories only
 min_file_size = 0  # Minimum file size in bytes (0 = no minimum)
@@ -87,6 +111,102 @@ only_show_folders_with_specific_char_indir = {}
 only_show_files_with_specific_char_indir_recursive = {}
 only_show_folders_with_specific_char_indir_recursive = {}
 
+# Names of the settings above, in the order they are declared
+SETTING_NAMES = (
+    "tree_depth", "show_subdirectory_files", "sort_alphabetically", "sort_mode", "sort_reverse", "max_entries_per_dir",
+    "use_scan_cache", "scan_cache_path", "scan_cache_max_entries", "scan_workers",
+    "size_rollups", "show_sizes", "sort_by_size",
+    "tree_style", "root_emoji", "subdir_emoji", "extra_indent",
+    "exclude_folders", "exclude_folders_in_dirs", "exclude_files_in_dirs", "hide_files_in_dirs",
+    "exclude_patterns", "exclude_file_with_char", "exclude_folder_with_char", "exclude_extensions",
+    "use_ignore_files", "ignore_file_names",
+    "show_files", "min_file_size", "max_file_size",
+    "only_show_files_with_specific_char_indir", "only_show_folders_with_specific_char_indir",
+    "only_show_files_with_specific_char_indir_recursive", "only_show_folders_with_specific_char_indir_recursive",
+)
+
+class TreeConfig:
+    """
+    Settings for one tree generation run.
+
+    Attribute names match the module-level settings above. Settings that are
+    not passed take the current value of the module global, and every value is
+    copied, so a config is unaffected by later changes to the globals or to
+    other configs. This lets several trees be generated at once in one process.
+    """
+    __slots__ = SETTING_NAMES
+
+    def __init__(self, **settings):
+        unknown = set(settings) - set(SETTING_NAMES)
+        if unknown:
+            raise TypeError(f"Unknown tree setting(s): {', '.join(sorted(unknown))}")
+        module = sys.modules[__name__]
+        for name in SETTING_NAMES:
+            value = settings[name] if name in settings else getattr(module, name)
+            setattr(self, name, copy.deepcopy(value))
+
+    @classmethod
+    def from_settings(cls, settings):
+        """
+        Build a config from a settings mapping such as the GUI's advanced settings.
+
+        Unknown keys are ignored, and "directory_rules" (a list of
+        {"directory", "type", "pattern"} dicts) is merged into
+        exclude_folders_in_dirs / exclude_files_in_dirs.
+        """
+        values = {key: value for key, value in settings.items() if key in SETTING_NAMES}
+        rules = settings.get("directory_rules")
+        if rules:
+            folders, files = directory_rules_to_dicts(rules)
+            values["exclude_folders_in_dirs"] = _merge_rule_dicts(values.get("exclude_folders_in_dirs", {}), folders)
+            values["exclude_files_in_dirs"] = _merge_rule_dicts(values.get("exclude_files_in_dirs", {}), files)
+        return cls(**values)
+
+    def replace(self, **changes):
+        """Return a copy of this config with some settings changed."""
+        values = self.to_dict()
+        values.update(changes)
+        return TreeConfig(**values)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in SETTING_NAMES}
+
+    def __repr__(self):
+        return f"TreeConfig(tree_depth={self.tree_depth!r}, show_files={self.show_files!r}, ...)"
+
+def directory_rules_to_dicts(rules):
+    """
+    Convert directory rules into the exclude_folders_in_dirs / exclude_files_in_dirs dictionaries.
+
+    Args:
+        rules (list): Dicts with "directory", "type" (exclude_folder, exclude_file or
+            exclude_file_and_folder) and "pattern" keys
+
+    Returns:
+        tuple: (exclude_folders_in_dirs, exclude_files_in_dirs)
+    """
+    exclude_folders_in_dirs = {}
+    exclude_files_in_dirs = {}
+    for rule in rules:
+        d = rule["directory"]
+        pat = rule["pattern"]
+        if rule["type"] in ("exclude_folder", "exclude_file_and_folder"):
+            exclude_folders_in_dirs.setdefault(d, []).append(pat)
+        if rule["type"] in ("exclude_file", "exclude_file_and_folder"):
+            exclude_files_in_dirs.setdefault(d, []).append(pat)
+    return exclude_folders_in_dirs, exclude_files_in_dirs
+
+def _merge_rule_dicts(base, extra):
+    merged = {}
+    for d, patterns in base.items():
+        merged[d] = patterns if isinstance(patterns, str) else list(patterns)
+    for d, patterns in extra.items():
+        if d not in merged:
+            merged[d] = patterns
+        elif not isinstance(merged[d], str):  # "*" already excludes everything
+            merged[d] = merged[d] + patterns
+    return merged
+
 def matches_pattern(filename, pattern):
     """
     Check if a filename matches a pattern (supports basic wildcards * and ?), or if the pattern is a substring (case-insensitive).
@@ -98,7 +218,6 @@ def matches_pattern(filename, pattern):
     Returns:
         bool: True if the filename matches the pattern
     """
-    import fnmatch
     if fnmatch.fnmatch(filename, pattern):
         return True
     # Substring match (case-insensitive)
@@ -106,9 +225,191 @@ def matches_pattern(filename, pattern):
         return True
     return False
 
+class ScanEntry:
+    """
+    A directory entry classified once from os.scandir.
+
+    The file type is taken from the DirEntry (which uses the type information
+    returned by the directory listing where the platform provides it) and the
+    size is fetched lazily with at most one stat call, then cached so that
+    classification, size filtering and rendering all share the same result.
+    """
+    __slots__ = ("name", "path", "is_dir", "is_file", "_entry", "_size", "_mtime")
+
+    def __init__(self, name, path, is_dir, is_file, entry=None, size=None):
+        self.name = name
+        self.path = path
+        self.is_dir = is_dir
+        self.is_file = is_file
+        self._entry = entry
+        self._size = size
+        self._mtime = None
+
+    @classmethod
+    def from_dir_entry(cls, entry):
+        """Build a ScanEntry from an os.DirEntry without issuing extra syscalls where possible."""
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        is_file = False
+        if not is_dir:
+            try:
+                is_file = entry.is_file()
+            except OSError:
+                is_file = False
+        return cls(entry.name, entry.path, is_dir, is_file, entry)
+
+    @classmethod
+    def from_path(cls, path):
+        """Build a ScanEntry for a single path (one stat call)."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return cls(os.path.basename(path), path, False, False, size=-1)
+        is_dir = stat.S_ISDIR(st.st_mode)
+        is_file = stat.S_ISREG(st.st_mode)
+        return cls(os.path.basename(path), path, is_dir, is_file, size=st.st_size)
+
+    def is_symlink(self):
+        """Whether the entry itself is a symbolic link (from the listing where the platform provides it)."""
+        if self._entry is not None:
+            try:
+                return self._entry.is_symlink()
+            except OSError:
+                return False
+        return os.path.islink(self.path)
+
+    def stat(self):
+        """
+        Stat the entry, following symbolic links, and keep its size and modification time.
+
+        Returns:
+            os.stat_result: The result of the stat call
+
+        Raises:
+            OSError: If the entry cannot be stat-ed; both are then kept as unavailable
+        """
+        try:
+            st = self._entry.stat() if self._entry is not None else os.stat(self.path)
+        except OSError:
+            self._store(-1, -1.0)
+            raise
+        self._store(st.st_size, st.st_mtime)
+        return st
+
+    def _store(self, size, mtime):
+        # Fills in whichever of the two is not known yet
+        if self._size is None:
+            self._size = size
+        if self._mtime is None:
+            self._mtime = mtime
+
+    def fetch_metadata(self):
+        """
+        Fetch the size and modification time with one stat call, unless both are known.
+
+        Returns:
+            bool: Whether a stat call was made
+        """
+        if self._size is not None and self._mtime is not None:
+            return False
+        try:
+            self.stat()
+        except OSError:
+            pass
+        return True
+
+    @property
+    def size(self):
+        """File size in bytes, or None if it cannot be read."""
+        if self._size is None:
+            self.fetch_metadata()
+        return None if self._size < 0 else self._size
+
+    @property
+    def mtime(self):
+        """Modification time in seconds since the epoch, or None if it cannot be read."""
+        if self._mtime is None:
+            self.fetch_metadata()
+        return None if self._mtime < 0 else self._mtime
+
+class TruncationSummary:
+    """
+    Stands in for the entries of a directory beyond max_entries_per_dir.
+
+    It is the last item of the directory's files list and is rendered as one
+    summary line, e.g. "… 499,950 more files (12.3 GB)". The size is only
+    given when size rollups are on (see uses_size_rollups), whose pass stats
+    every file anyway; otherwise the point of the cap is to not stat the
+    entries that are left out.
+    """
+    __slots__ = ("dirs", "files", "size")
+    is_dir = False
+    is_file = False
+    path = None
+
+    def __init__(self, dirs, files, size=None):
+        self.dirs = dirs  # Hidden directories
+        self.files = files  # Hidden files
+        self.size = size  # Total size of the hidden files in bytes, or None if unknown
+
+    @property
+    def count(self):
+        return self.dirs + self.files
+
+    @property
+    def name(self):
+        parts = []
+        if self.dirs:
+            parts.append(f"{self.dirs:,} more folder{'' if self.dirs == 1 else 's'}")
+        if self.files:
+            text = f"{self.files:,} more file{'' if self.files == 1 else 's'}"
+            if self.size is not None:
+                text += f" ({format_size(self.size)})"
+            parts.append(text)
+        return "… " + " and ".join(parts)
+
+def _entry_sort_key(entry):
+    return entry.name.lower()
+
+_DIGITS = re.compile(r"(\d+)")
+
+def _natural_sort_key(entry):
+    # "file2" before "file10": runs of digits compare as numbers
+    name = entry.name.lower()
+    parts = _DIGITS.split(name)
+    parts[1::2] = map(int, parts[1::2])
+    return (parts, name)
+
+def _extension_sort_key(entry):
+    name = entry.name.lower()
+    if entry.is_dir:
+        return ("", name)
+    return (os.path.splitext(name)[1], name)
+
+def scan_directory(path):
+    """
+    List a directory once with os.scandir.
+
+    Args:
+        path (str): The directory to list
+
+    Returns:
+        list: ScanEntry objects for every item in the directory
+
+    Raises:
+        OSError: If the directory cannot be listed
+    """
+    with os.scandir(path) as it:
+        return [ScanEntry.from_dir_entry(entry) for entry in it]
+
 def should_include_item(item, path, parent_dir=None, root_dir=None):
     """
     Determine if an item should be included in the tree based on filtering rules.
+
+    Convenience wrapper for single paths; the tree generator filters whole
+    listings through a FilterPlan instead.
     
     Args:
         item (str): The name of the file or folder
@@ -119,225 +420,1611 @@ def should_include_item(item, path, parent_dir=None, root_dir=None):
     Returns:
         bool: True if the item should be included, False otherwise
     """
-    # Directory-specific rules
-    if parent_dir:
-        # Exclude folders in specific directories
-        if os.path.isdir(path) and parent_dir in exclude_folders_in_dirs:
-            patterns = exclude_folders_in_dirs[parent_dir]
-            if patterns == "*":
-                return False
-            if any(matches_pattern(item, pattern) for pattern in patterns):
-                return False
-        # Exclude files in specific directories
-        if os.path.isfile(path) and parent_dir in exclude_files_in_dirs:
-            patterns = exclude_files_in_dirs[parent_dir]
-            if patterns == "*":
-                return False
-            if any(matches_pattern(item, pattern) for pattern in patterns):
-                return False
-    # Check for excluded patterns (applies to both files and folders)
-    if any(item.startswith(pattern) for pattern in exclude_patterns):
-        return False
-        
-    # If it's a directory, always show unless excluded by other rules
-    if os.path.isdir(path):
-        # Check if folder name is in exclude list
-        if item in exclude_folders:
-            return False
-        # Check if folder name contains any excluded characters
-        if any(char in item for char in exclude_folder_with_char):
+    entry = ScanEntry.from_path(path)
+    entry.name = item
+    if not (entry.is_dir or entry.is_file):
+        return not item.startswith(tuple(exclude_patterns))
+    # Correct root file logic: parent dir of file must match root_dir
+    if root_dir is not None:
+        is_root_file = os.path.dirname(os.path.abspath(path)) == os.path.abspath(root_dir)
+    else:
+        is_root_file = os.path.dirname(path) == os.path.dirname(os.path.abspath(__file__))
+    plan = FilterPlan.from_globals()
+    context = plan.root_context(os.path.dirname(path)) if plan.recursive_folder_rules or plan.ignore_file_names else ()
+    dirs, files = plan.filter_listing([entry], parent_dir, is_root_file, context, keep_all_files=True)
+    return bool(dirs or files)
+
+def _parse_size(value, default):
+    """Normalise a size bound that may be stored as a number or a string such as "inf"."""
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return default
+    return value
+
+def _substring_regex(substrings, lower=False):
+    """Compile a list of substrings into one regex alternation (None if the list is empty)."""
+    if not substrings:
+        return None
+    if lower:
+        substrings = [sub.lower() for sub in substrings]
+    return re.compile("|".join(re.escape(sub) for sub in substrings))
+
+class PatternSet:
+    """
+    A precompiled equivalent of calling matches_pattern for several patterns.
+
+    All globs are merged into one regex and all substrings into another, so
+    checking a name costs two regex calls however many patterns there are.
+    """
+    __slots__ = ("match_all", "_glob", "_substring")
+
+    def __init__(self, patterns):
+        self.match_all = patterns == "*"
+        self._glob = None
+        self._substring = None
+        if self.match_all:
+            return
+        patterns = list(patterns)
+        if patterns:
+            self._glob = re.compile("|".join(fnmatch.translate(os.path.normcase(p)) for p in patterns))
+            self._substring = _substring_regex(patterns, lower=True)
+
+    def matches(self, name):
+        """Return True if the name matches any of the patterns."""
+        if self.match_all:
+            return True
+        if self._glob is None:
             return False
-            
-        # Check directory-specific folder exclusions
-        if parent_dir and parent_dir in exclude_folders_in_dirs:
-            patterns = exclude_folders_in_dirs[parent_dir]
-            if isinstance(patterns, str) and patterns == "*":
-                return False
-            if isinstance(patterns, list):
-                if any(matches_pattern(item, pattern) for pattern in patterns):
-                    return False
-                    
-        # --- Recursive include-only-folder rules ---
-        # If this is a directory, check up the directory tree for recursive include-only-folder rules
-        current_path = os.path.abspath(path)
-        ancestors = []
+        if self._glob.match(os.path.normcase(name)):
+            return True
+        return self._substring.search(name.lower()) is not None
+
+# Reasons an entry can be left out of the tree, as counted by TreeStats
+EXCLUSION_CATEGORIES = (
+    "folder_name",  # exclude_folders
+    "pattern",  # exclude_patterns (name prefixes)
+    "extension",  # exclude_extensions
+    "name_chars",  # exclude_file_with_char / exclude_folder_with_char
+    "directory_rule",  # exclude_*_in_dirs and directory_rules
+    "ignore_file",  # use_ignore_files (.gitignore / .ignore)
+    "include_only",  # only_show_*_with_specific_char_indir (including recursive rules)
+    "files_hidden",  # show_files, show_subdirectory_files, hide_files_in_dirs
+    "size",  # min_file_size / max_file_size, or size unreadable while a size filter is set
+    "other",  # Neither a file nor a directory (e.g. broken symbolic links)
+)
+(_EX_FOLDER_NAME, _EX_PATTERN, _EX_EXTENSION, _EX_NAME_CHARS, _EX_DIRECTORY_RULE, _EX_IGNORE_FILE,
+ _EX_INCLUDE_ONLY, _EX_FILES_HIDDEN, _EX_SIZE, _EX_OTHER) = range(len(EXCLUSION_CATEGORIES))
+
+class TreeStats:
+    """
+    Per-phase timings and counters for one tree generation run.
+
+    Pass an instance to iter_tree_lines (or with_stats=True to
+    generate_directory_tree) to have it filled in. Phase times are summed
+    over every directory; with scan_workers > 0 the listing, stat, filtering
+    and sorting times add up work done on several threads, so together they
+    can exceed the elapsed time.
+    """
+    PHASES = ("listing", "stat", "filtering", "sorting", "formatting", "rollups")
+
+    def __init__(self):
+        self.times = dict.fromkeys(self.PHASES, 0.0)
+        self.elapsed = 0.0
+        self.directories = 0  # Directories listed
+        self.entries_seen = 0  # Entries returned by the listings
+        self.entries_shown = 0  # Entries in the output (the root line is not counted)
+        self.entries_truncated = 0  # Entries left out by max_entries_per_dir
+        self.stat_calls = 0  # Entries stat-ed for their size or modification time
+        self.errors = 0  # Directories that could not be listed (OSError)
+        self.excluded = dict.fromkeys(EXCLUSION_CATEGORIES, 0)
+        self._lock = threading.Lock()
+
+    def add_filtering(self, entries_seen, excluded, stat_time, stat_calls):
+        # Called once per listing, possibly from scan worker threads
+        with self._lock:
+            self.entries_seen += entries_seen
+            self.stat_calls += stat_calls
+            self.times["stat"] += stat_time
+            # Stat calls happen while filtering; keep the two phases apart
+            self.times["filtering"] -= stat_time
+            for category, count in zip(EXCLUSION_CATEGORIES, excluded):
+                if count:
+                    self.excluded[category] += count
+
+    def add_listing(self, listing_time, filtering_time, sorting_time):
+        with self._lock:
+            self.directories += 1
+            self.times["listing"] += listing_time
+            self.times["filtering"] += filtering_time
+            self.times["sorting"] += sorting_time
+
+    def add_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def add_stats(self, stat_calls, stat_time, phase=None):
+        # Stat calls made outside filtering; with phase, their time was timed as part of that phase too
+        with self._lock:
+            self.stat_calls += stat_calls
+            self.times["stat"] += stat_time
+            if phase is not None:
+                self.times[phase] -= stat_time
+
+    def add_truncation(self, hidden, size_excluded, stat_time, stat_calls):
+        with self._lock:
+            self.entries_truncated += hidden
+            self.excluded["size"] += size_excluded
+            self.stat_calls += stat_calls
+            self.times["stat"] += stat_time
+            self.times["filtering"] -= stat_time
+
+    @property
+    def entries_excluded(self):
+        return sum(self.excluded.values())
+
+    def summary(self):
+        """One-line summary, e.g. for a status bar."""
+        phases = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in self.times.items() if seconds >= 0.005)
+        return (f"{self.directories:,} dirs, {self.entries_seen:,} entries seen, "
+                f"{self.entries_excluded:,} excluded, {self.errors:,} errors"
+                + (f" | {phases}" if phases else ""))
+
+    def report(self):
+        """Multi-line report of every timer and counter."""
+        lines = [
+            f"elapsed          {self.elapsed:10.3f}s",
+        ]
+        for phase, seconds in self.times.items():
+            share = f" ({seconds / self.elapsed:.0%})" if self.elapsed > 0 else ""
+            lines.append(f"  {phase:<15}{seconds:10.3f}s{share}")
+        lines += [
+            f"directories      {self.directories:10,}",
+            f"entries seen     {self.entries_seen:10,}",
+            f"entries shown    {self.entries_shown:10,}",
+            f"entries truncated{self.entries_truncated:10,}",
+            f"stat calls       {self.stat_calls:10,}",
+            f"errors           {self.errors:10,}",
+            f"excluded         {self.entries_excluded:10,}",
+        ]
+        for category, count in self.excluded.items():
+            if count:
+                lines.append(f"  {category:<15}{count:10,}")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {
+            "elapsed": self.elapsed,
+            "times": dict(self.times),
+            "directories": self.directories,
+            "entries_seen": self.entries_seen,
+            "entries_shown": self.entries_shown,
+            "entries_truncated": self.entries_truncated,
+            "stat_calls": self.stat_calls,
+            "errors": self.errors,
+            "excluded": dict(self.excluded),
+        }
+
+# Context with no active rules: (recursive folder matchers, ignore rules)
+_NO_CONTEXT = ((), ())
+
+def _is_ignored(ignores, name, is_dir):
+    # Every ignore file from the top down has its say; the deepest match wins
+    ignored = False
+    for rules, prefix in ignores:
+        result = rules.match(prefix + name, name, is_dir)
+        if result is not None:
+            ignored = result
+    return ignored
+
+class FilterPlan:
+    """
+    Filtering rules compiled once per run.
+
+    Reads the rule settings a single time (from this module's globals or any
+    object exposing the same attribute names), turns lists into sets, patterns
+    into precompiled regexes and size bounds into numbers, and then filters
+    whole directory listings in one call.
+    """
+
+    def __init__(self, settings):
+        self.show_files = settings.show_files
+        self.show_subdirectory_files = settings.show_subdirectory_files
+        self.exclude_folders = frozenset(settings.exclude_folders)
+        self.exclude_prefixes = tuple(settings.exclude_patterns)
+        self.exclude_extensions = tuple(settings.exclude_extensions)
+        self.folder_char_regex = _substring_regex(settings.exclude_folder_with_char)
+        self.file_char_regex = _substring_regex(settings.exclude_file_with_char)
+        self.hide_files_in_dirs = frozenset(settings.hide_files_in_dirs)
+        self.min_file_size = _parse_size(settings.min_file_size, 0)
+        self.max_file_size = _parse_size(settings.max_file_size, float('inf'))
+        self.max_entries = max(0, int(settings.max_entries_per_dir or 0))
+        # Files are only stat-ed for filtering when a size bound is actually set
+        self.filters_sizes = self.min_file_size > 0 or self.max_file_size != float('inf')
+        # Truncation summaries give the hidden files' total only when sizes are rolled up
+        self.summary_sizes = uses_size_rollups(settings)
+        self.folder_rules = {d: PatternSet(p) for d, p in settings.exclude_folders_in_dirs.items()}
+        self.file_rules = {d: PatternSet(p) for d, p in settings.exclude_files_in_dirs.items()}
+        self.only_folder_rules = {
+            d: PatternSet(p) for d, p in settings.only_show_folders_with_specific_char_indir.items()
+        }
+        # Recursive include-only-folder rules: every recursive pattern becomes its own matcher,
+        # since a folder has to satisfy all of them
+        self.recursive_folder_rules = {}
+        for d, patterns in settings.only_show_folders_with_specific_char_indir_recursive.items():
+            matchers = []
+            for pattern in patterns or []:
+                # If legacy (plain string), treat as not recursive
+                if isinstance(pattern, (list, tuple)):
+                    pat, recursive = pattern
+                    if recursive:
+                        matchers.append(PatternSet([pat]))
+            if matchers:
+                self.recursive_folder_rules[d] = tuple(matchers)
+        # Ignore files are read as directories are entered (see child_context)
+        self.ignore_file_names = tuple(settings.ignore_file_names) if settings.use_ignore_files else ()
+        # Optional callable (directory, file_names) -> IgnoreRules or None, used
+        # instead of reading the files (see RetainedScan.load_ignore_rules)
+        self.ignore_loader = None
+
+    @classmethod
+    def from_globals(cls):
+        """Build a plan from the module-level configuration variables."""
+        return cls(sys.modules[__name__])
+
+    def for_totals(self):
+        """Return a copy that keeps every file the exclusion rules allow, for size totals."""
+        plan = copy.copy(self)
+        plan.show_files = True
+        plan.show_subdirectory_files = True
+        plan.hide_files_in_dirs = frozenset()
+        return plan
+
+    def root_context(self, root_dir):
+        """
+        Build the active-rules context for the root directory.
+
+        Recursive include-only-folder rules apply below any directory with a
+        matching name, including directories above the root, so the root path
+        is walked once here instead of for every entry.
+
+        Ignore files apply from the repository root down (the closest
+        directory above root_dir holding .git), so those between it and the
+        root are read here too.
+
+        Args:
+            root_dir (str): The root directory of the tree
+
+        Returns:
+            tuple: Opaque context to pass to filter_listing and child_context: the
+                recursive folder matchers and the ignore rules active inside root_dir
+        """
+        context = ()
+        current_path = os.path.abspath(root_dir)
         while True:
+            context = self.child_context(context, os.path.basename(current_path))
             parent = os.path.dirname(current_path)
             if parent == current_path:
                 break
-            ancestors.append(os.path.basename(parent))
             current_path = parent
-        # Check all ancestors for recursive include-only-folder rules
-        for ancestor in ancestors:
-            patterns = only_show_folders_with_specific_char_indir_recursive.get(ancestor, [])
-            if patterns:
-                # patterns is a list of (pattern, recursive) or just pattern if legacy
-                for idx, pattern in enumerate(patterns):
-                    # If legacy, treat as not recursive
-                    if isinstance(pattern, str):
-                        pat = pattern
-                        recursive = False
-                    elif isinstance(pattern, list) or isinstance(pattern, tuple):
-                        pat, recursive = pattern
-                    else:
-                        continue
-                    if recursive:
-                        if not matches_pattern(item, pat):
-                            return False
-        # Also check direct parent for non-recursive include-only-folder rules
-        if parent_dir in only_show_folders_with_specific_char_indir:
-            patterns = only_show_folders_with_specific_char_indir[parent_dir]
-            if not any(matches_pattern(item, pattern) for pattern in patterns):
-                return False
-        # --- End recursive include-only-folder rules ---
-            
-        return True
-    
-    # If it's a file, apply file-specific filters
-    if os.path.isfile(path):
-        # Correct root file logic: parent dir of file must match root_dir
-        if root_dir is not None:
-            is_root_file = os.path.dirname(os.path.abspath(path)) == os.path.abspath(root_dir)
+        if not self.ignore_file_names:
+            return context
+        from backend.ignore_files import find_repository_root
+        matchers = context[0] if context else ()
+        root_path = os.path.abspath(root_dir)
+        top = find_repository_root(root_path) or root_path
+        # Directories from the repository root down to the tree root, each with the
+        # tree root's path relative to it
+        ignores = ()
+        relative = os.path.relpath(root_path, top).replace(os.sep, "/")
+        parts = [] if relative == "." else relative.split("/")
+        directory = top
+        for index in range(len(parts) + 1):
+            if index:
+                directory = os.path.join(directory, parts[index - 1])
+            rules = self._ignore_rules(directory)
+            if rules is not None:
+                prefix = "".join(part + "/" for part in parts[index:])
+                ignores += ((rules, prefix),)
+        return (matchers, ignores)
+
+    def child_context(self, context, dir_name, path=None):
+        """
+        Return the active-rules context inside a directory, given the context of its parent.
+
+        Args:
+            context (tuple): The parent's context
+            dir_name (str): The name of the directory
+            path (str): The directory's path, needed to read its ignore files
+
+        Returns:
+            tuple: The directory's context
+        """
+        matchers, ignores = context or _NO_CONTEXT
+        added = self.recursive_folder_rules.get(dir_name)
+        if not self.ignore_file_names:
+            if not added:
+                return context
+            return (matchers + added, ignores)
+        if added:
+            matchers = matchers + added
+        if ignores:
+            # Entries are matched by their path relative to each ignore file's directory
+            ignores = tuple((rules, prefix + dir_name + "/") for rules, prefix in ignores)
+        if path is not None:
+            rules = self._ignore_rules(path)
+            if rules is not None:
+                ignores += ((rules, ""),)
+        return (matchers, ignores)
+
+    def _ignore_rules(self, directory):
+        if self.ignore_loader is not None:
+            return self.ignore_loader(directory, self.ignore_file_names)
+        from backend.ignore_files import load_ignore_rules
+        return load_ignore_rules(directory, self.ignore_file_names)
+
+    def filter_listing(self, entries, parent_dir, is_root_level, context=(), keep_all_files=False, stats=None,
+                       check_sizes=True):
+        """
+        Filter a whole directory listing in one call.
+
+        Rules that depend only on the parent directory are resolved once for
+        the listing rather than once per entry.
+
+        Args:
+            entries (list): ScanEntry objects from scan_directory
+            parent_dir (str): The name of the listed directory
+            is_root_level (bool): Whether the listed directory is the tree root
+            context (tuple): Active rules for the directory (see root_context/child_context)
+            keep_all_files (bool): Ignore show_files (used for single-item checks)
+            stats (TreeStats): Optional collector for exclusion counts and stat timings
+            check_sizes (bool): Apply min_file_size / max_file_size; when False the size
+                check is left to the caller (see truncate). Without size bounds no
+                file is stat-ed either way
+
+        Returns:
+            tuple: (dirs, files) lists of included ScanEntry objects, in listing order
+        """
+        dirs = []
+        files = []
+        exclude_prefixes = self.exclude_prefixes
+
+        # Per-directory folder rules
+        folder_rule = self.folder_rules.get(parent_dir) if parent_dir else None
+        only_folder_rule = self.only_folder_rules.get(parent_dir)
+        folders_allowed = folder_rule is None or not folder_rule.match_all
+
+        # Per-directory file rules: always show files in root directory, but for
+        # subdirectories respect show_subdirectory_files setting
+        file_rule = self.file_rules.get(parent_dir) if parent_dir else None
+        files_allowed = (
+            (self.show_files or keep_all_files)
+            and (is_root_level or self.show_subdirectory_files)
+            and not (parent_dir and parent_dir in self.hide_files_in_dirs)
+            and (file_rule is None or not file_rule.match_all)
+        )
+
+        matchers, ignores = context or _NO_CONTEXT
+        exclude_folders = self.exclude_folders
+        folder_char_regex = self.folder_char_regex
+        file_char_regex = self.file_char_regex
+        exclude_extensions = self.exclude_extensions
+        min_size = self.min_file_size
+        max_size = self.max_file_size
+        check_sizes = check_sizes and self.filters_sizes
+
+        # Excluded entries per category (see EXCLUSION_CATEGORIES)
+        excluded = [0] * len(EXCLUSION_CATEGORIES)
+        stat_time = 0.0
+        stat_calls = 0
+        timed = stats is not None
+
+        for entry in entries:
+            item = entry.name
+            if entry.is_dir:
+                if not folders_allowed:
+                    excluded[_EX_DIRECTORY_RULE] += 1
+                    continue
+                if item in exclude_folders:
+                    excluded[_EX_FOLDER_NAME] += 1
+                    continue
+                if item.startswith(exclude_prefixes):
+                    excluded[_EX_PATTERN] += 1
+                    continue
+                if folder_char_regex is not None and folder_char_regex.search(item):
+                    excluded[_EX_NAME_CHARS] += 1
+                    continue
+                if folder_rule is not None and folder_rule.matches(item):
+                    excluded[_EX_DIRECTORY_RULE] += 1
+                    continue
+                if matchers and not all(matcher.matches(item) for matcher in matchers):
+                    excluded[_EX_INCLUDE_ONLY] += 1
+                    continue
+                if only_folder_rule is not None and not only_folder_rule.matches(item):
+                    excluded[_EX_INCLUDE_ONLY] += 1
+                    continue
+                # Ignored directories are pruned here, before anything inside them is listed
+                if ignores and _is_ignored(ignores, item, True):
+                    excluded[_EX_IGNORE_FILE] += 1
+                    continue
+                dirs.append(entry)
+            elif entry.is_file:
+                if not files_allowed:
+                    excluded[_EX_FILES_HIDDEN] += 1
+                    continue
+                if item.startswith(exclude_prefixes):
+                    excluded[_EX_PATTERN] += 1
+                    continue
+                if item.endswith(exclude_extensions):
+                    excluded[_EX_EXTENSION] += 1
+                    continue
+                if file_char_regex is not None and file_char_regex.search(item):
+                    excluded[_EX_NAME_CHARS] += 1
+                    continue
+                if file_rule is not None and file_rule.matches(item):
+                    excluded[_EX_DIRECTORY_RULE] += 1
+                    continue
+                if ignores and _is_ignored(ignores, item, False):
+                    excluded[_EX_IGNORE_FILE] += 1
+                    continue
+                if not check_sizes:
+                    files.append(entry)
+                    continue
+                # Check file size (one cached stat per file); unreadable sizes are excluded
+                if timed and entry._size is None:
+                    start = time.perf_counter()
+                    size = entry.size
+                    stat_time += time.perf_counter() - start
+                    stat_calls += 1
+                else:
+                    size = entry.size
+                if size is None or not (min_size <= size <= max_size):
+                    excluded[_EX_SIZE] += 1
+                    continue
+                files.append(entry)
+            else:
+                # Broken symbolic links, devices and the like
+                excluded[_EX_OTHER] += 1
+        if timed:
+            stats.add_filtering(len(entries), excluded, stat_time, stat_calls)
+        return dirs, files
+
+    def truncate(self, dirs, files, stats=None):
+        """
+        Apply max_entries_per_dir to a sorted listing.
+
+        Directories come first, then files. With a size filter set, files are
+        size-checked here, in order, only until the cap is reached; the rest are counted but never
+        stat-ed, so the summary can include files the size filters would
+        have excluded.
+
+        Args:
+            dirs (list): Sorted directories from filter_listing
+            files (list): Sorted files from filter_listing(check_sizes=False)
+            stats (TreeStats): Optional collector for truncation counts and stat timings
+
+        Returns:
+            tuple: (dirs, files) where files ends with a TruncationSummary if anything was left out
+        """
+        cap = self.max_entries
+        min_size = self.min_file_size
+        max_size = self.max_file_size
+        timed = stats is not None
+        stat_time = 0.0
+        stat_calls = 0
+        size_excluded = 0
+        shown_dirs = dirs[:cap]
+        room = cap - len(shown_dirs)
+        if not self.filters_sizes:
+            # Nothing to check: the first files up to the cap are shown as they are
+            shown_files = files[:room]
+            index = len(shown_files)
         else:
-            is_root_file = os.path.dirname(path) == os.path.dirname(os.path.abspath(__file__))
-        
-        # Always show files in root directory, but for subdirectories respect show_subdirectory_files setting
-        if not is_root_file and not show_subdirectory_files:
-            return False
-            
-        # Check if parent directory is in hide_files_in_dirs
-        if parent_dir and parent_dir in hide_files_in_dirs:
-            return False
-            
-        # Check directory-specific file exclusions
-        if parent_dir and parent_dir in exclude_files_in_dirs:
-            patterns = exclude_files_in_dirs[parent_dir]
-            if isinstance(patterns, str) and patterns == "*":
-                return False
-            if isinstance(patterns, list):
-                if any(matches_pattern(item, pattern) for pattern in patterns):
-                    return False
-        
-        # Check if file contains any excluded characters
-        if any(char in item for char in exclude_file_with_char):
-            return False
-            
-        # Check file extension
-        if any(item.endswith(ext) for ext in exclude_extensions):
-            return False
-            
-        # Check file size if specified
+            shown_files = []
+            index = 0
+            for index, entry in enumerate(files):
+                if not room:
+                    break
+                if timed and entry._size is None:
+                    start = time.perf_counter()
+                    size = entry.size
+                    stat_time += time.perf_counter() - start
+                    stat_calls += 1
+                else:
+                    size = entry.size
+                if size is None or not (min_size <= size <= max_size):
+                    size_excluded += 1
+                    continue
+                shown_files.append(entry)
+                room -= 1
+            else:
+                index = len(files)
+        hidden_dirs = len(dirs) - len(shown_dirs)
+        hidden = files[index:]
+        if hidden_dirs or hidden:
+            size = None
+            if self.summary_sizes and hidden:
+                # The rollup pass has stat-ed these already, unless their listing was read again
+                size = 0
+                for entry in hidden:
+                    if timed and entry._size is None:
+                        start = time.perf_counter()
+                        entry_size = entry.size
+                        stat_time += time.perf_counter() - start
+                        stat_calls += 1
+                    else:
+                        entry_size = entry.size
+                    if entry_size is None:
+                        size = None
+                        break
+                    size += entry_size
+            shown_files.append(TruncationSummary(hidden_dirs, len(hidden), size))
+        if timed:
+            stats.add_truncation(hidden_dirs + len(hidden), size_excluded, stat_time, stat_calls)
+        return shown_dirs, shown_files
+
+def list_children(plan, path, dir_name, is_root_level, context, sort=True, lister=scan_directory,
+                  sort_key=_entry_sort_key, stats=None, reverse=False):
+    """
+    List, filter and sort one directory.
+
+    This is the unit of work shared by the sequential and the parallel scan,
+    which is what keeps their output identical.
+
+    Args:
+        plan (FilterPlan): The compiled filtering rules
+        path (str): The directory to list
+        dir_name (str): The name used for directory-specific rules
+        is_root_level (bool): Whether the directory is the tree root
+        context (tuple): Active rules for the directory (see FilterPlan.root_context)
+        sort (bool): Sort directories and files case-insensitively
+        lister (callable): Returns the entries of a directory (scan_directory or ScanCache.listing)
+        sort_key (callable): Key used when sorting (case-insensitive name by default, see make_sort_key)
+        stats (TreeStats): Optional collector for per-phase timings and counters
+        reverse (bool): Reverse the sort order
+
+    Returns:
+        tuple: (dirs, files) lists of included ScanEntry objects
+
+    Raises:
+        OSError: If the directory cannot be listed
+    """
+    if stats is not None:
+        return _list_children_timed(plan, path, dir_name, is_root_level, context, sort, lister, sort_key, stats, reverse)
+    # List the directory once; every entry is classified from the scandir result
+    entries = lister(path)
+    # A listing longer than the cap may be truncated: size checks wait until after sorting
+    truncate = plan.max_entries and len(entries) > plan.max_entries
+    dirs, files = plan.filter_listing(entries, dir_name, is_root_level, context, check_sizes=not truncate)
+    summary = None
+    if truncate and sort and getattr(sort_key, "stats_entries", False):
+        # Picking the largest or newest entries would stat every entry of a long
+        # listing, so the ones to show are picked in name order and only those sorted
+        dirs, files, summary = _truncate_by_name(plan, dirs, files)
+        truncate = False
+    # Sort directories and files separately if sorting is enabled
+    if sort:
+        # The key is computed once per entry; case-insensitive name by default
+        dirs.sort(key=sort_key, reverse=reverse)
+        files.sort(key=sort_key, reverse=reverse)
+    if truncate:
+        return plan.truncate(dirs, files)
+    if summary is not None:
+        files.append(summary)
+    return dirs, files
+
+def _truncate_by_name(plan, dirs, files, stats=None):
+    # Applies max_entries_per_dir in name order; returns (dirs, files, summary),
+    # the TruncationSummary (or None) kept apart so the shown entries can be re-sorted
+    dirs.sort(key=_entry_sort_key)
+    files.sort(key=_entry_sort_key)
+    dirs, files = plan.truncate(dirs, files, stats)
+    if files and isinstance(files[-1], TruncationSummary):
+        return dirs, files[:-1], files[-1]
+    return dirs, files, None
+
+def _list_children_timed(plan, path, dir_name, is_root_level, context, sort, lister, sort_key, stats, reverse):
+    # list_children with every phase timed into stats
+    clock = time.perf_counter
+    start = clock()
+    try:
+        entries = lister(path)
+    except OSError:
+        stats.add_error()
+        raise
+    listed = clock()
+    truncate = plan.max_entries and len(entries) > plan.max_entries
+    dirs, files = plan.filter_listing(entries, dir_name, is_root_level, context, stats=stats,
+                                      check_sizes=not truncate)
+    # The size checks done while truncating count as filtering
+    filtering = clock() - listed
+    summary = None
+    if truncate and sort and getattr(sort_key, "stats_entries", False):
+        mark = clock()
+        dirs, files, summary = _truncate_by_name(plan, dirs, files, stats)
+        filtering += clock() - mark
+        truncate = False
+    needs_stat = getattr(sort_key, "needs_stat", None) if sort else None
+    if needs_stat is not None:
+        # Fetched here rather than inside list.sort, so the stat calls are counted
+        mark = clock()
+        stat_calls = 0
+        for entry in itertools.chain(dirs, files):
+            if needs_stat(entry):
+                entry.fetch_metadata()
+                stat_calls += 1
+        stats.add_stats(stat_calls, clock() - mark)
+    mark = clock()
+    if sort:
+        dirs.sort(key=sort_key, reverse=reverse)
+        files.sort(key=sort_key, reverse=reverse)
+    sorting = clock() - mark
+    if truncate:
+        mark = clock()
+        dirs, files = plan.truncate(dirs, files, stats)
+        filtering += clock() - mark
+    elif summary is not None:
+        files.append(summary)
+    stats.add_listing(listed - start, filtering, sorting)
+    return dirs, files
+
+# How many subdirectory listings each worker thread may run ahead of the output
+_PREFETCH_PER_WORKER = 4
+
+DirTotals = namedtuple("DirTotals", "size files dirs mtime", defaults=(None,))
+DirTotals.__doc__ = """Cumulative size in bytes, file count and subdirectory count of a directory, and the newest modification time of the files below it (None if there are none)."""
+
+def format_size(size):
+    """Format a byte count for display, e.g. 1536 -> "1.5 KB"."""
+    if size is None:
+        return "?"
+    if size < 1024:
+        return f"{size} B"
+    for unit in ("KB", "MB", "GB", "TB", "PB"):
+        size /= 1024
+        if size < 1024 or unit == "PB":
+            return f"{size:.1f} {unit}"
+
+def _directory_identity(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino)
+
+def links_to_ancestor(entry, ancestors):
+    """
+    Check whether a directory entry is a symbolic link back to a directory on the current path.
+
+    Descending into such a link would repeat the same directories forever, so
+    the traversals show it as a leaf instead. Only symbolic links are checked
+    (they are the only way a directory can reappear below itself). Each
+    ancestor is stat-ed the first time a link below it is checked and its
+    (st_dev, st_ino) kept in its identity slot, so the extra stat calls are
+    one per link plus one per open directory that has a link below it.
+
+    Args:
+        entry (ScanEntry): A directory entry about to be expanded
+        ancestors (iterable): The open directories from the root down to the
+            entry's parent, each with a path and an identity slot (None until
+            it is stat-ed)
+
+    Returns:
+        bool: True if the entry resolves to one of ancestors
+    """
+    if not entry.is_symlink():
+        return False
+    target = _directory_identity(entry.path)
+    if target is None:
+        return False
+    for ancestor in ancestors:
+        if ancestor.identity is None:
+            ancestor.identity = _directory_identity(ancestor.path)
+        if ancestor.identity == target:
+            return True
+    return False
+
+def _scan_for_totals(totals_plan, lister, path, name, is_root_level, context, timed=False):
+    # The per-directory work of the rollup pass, run on a worker thread when there
+    # is a pool: list, filter and stat the files. Hard-linked files are returned
+    # apart (and left out of size and the file count), so the caller counts each
+    # of them once, in traversal order
+    entries = lister(path)
+    dirs, files = totals_plan.filter_listing(entries, name, is_root_level, context)
+    size = 0
+    newest = None
+    linked = []
+    # The stat loop is timed as a whole, for TreeStats
+    start = time.perf_counter() if timed else 0.0
+    for entry in files:
         try:
-            size = os.path.getsize(path)
-            
-            # Handle max_file_size type conversion
-            max_size = max_file_size
-            if isinstance(max_size, str) and max_size == "inf":
-                max_size = float('inf')
-            elif isinstance(max_size, str):
-                try:
-                    max_size = float(max_size)
-                except ValueError:
-                    max_size = float('inf')
-            
-            if not (min_file_size <= size <= max_size):
-                return False
+            # Keeps the size and modification time for annotations and sorting too
+            st = entry.stat()
         except OSError:
-            return False  # If we can't get the file size, exclude it
-            
-    return True
-def generate_directory_tree(root_dir, output_file="directory-structure.txt"):
-    buffer = io.StringIO()
-    try:
-        # Get just the folder name instead of full path
-        root_name = os.path.basename(root_dir.rstrip(os.path.sep))
-        if not root_name:  # In case the path ends with a separator
-            root_name = os.path.basename(os.path.dirname(root_dir))
-        
+            pass
+        else:
+            if st.st_nlink > 1:
+                linked.append(((st.st_dev, st.st_ino), st.st_size))
+            else:
+                size += st.st_size
+        mtime = entry._mtime
+        if mtime is not None and mtime >= 0 and (newest is None or mtime > newest):
+            newest = mtime
+    stat_time = time.perf_counter() - start if timed else 0.0
+    return entries, dirs, size, len(files) - len(linked), newest, linked, stat_time
+
+# Seconds between two progress reports of collect_size_rollups
+_ROLLUP_PROGRESS_INTERVAL = 0.1
+
+class _RollupFrame:
+    """An open directory of the rollup pass, with its running totals."""
+    __slots__ = ("path", "level", "size", "files", "dirs", "newest", "upcoming", "pending")
+
+    def __init__(self, path, level, size, files, dirs, newest, upcoming):
+        self.path = path
+        self.level = level
+        self.size = size
+        self.files = files
+        self.dirs = dirs
+        self.newest = newest
+        self.upcoming = upcoming  # Subdirectories not visited yet, with their contexts
+        self.pending = deque()  # (child, context, future) listed ahead on the pool
+
+def collect_size_rollups(plan, root_dir, max_depth, lister=scan_directory, executor=None, window=1,
+                         should_stop=None, progress=None, max_retained_entries=2_000_000, contexts=None,
+                         stats=None):
+    """
+    Scan a tree once, bottom-up, and total the size of every directory.
+
+    Totals count every file below a directory that passes the filtering
+    rules, including directories deeper than max_depth; the show_files and
+    show_subdirectory_files display switches do not change them. Sizes are
+    apparent sizes (like du --apparent-size), a file with several hard links
+    is counted once in both (by st_dev, st_ino), and symbolic links to directories
+    are not followed. The same stat call gives each file's modification
+    time, from which the newest one below every directory is kept too.
+
+    Listings of the directories the tree will show are kept, so rendering the
+    tree afterwards needs no second pass over the disk. With unlimited depth
+    that is every directory of the tree, so at most max_retained_entries
+    entries are kept; directories beyond that are listed again when rendered.
+
+    Args:
+        plan (FilterPlan): The compiled filtering rules
+        root_dir (str): The root directory of the tree
+        max_depth: The deepest level that will be expanded (see parse_tree_depth)
+        lister (callable): Returns the entries of a directory
+        executor (Executor): Optional thread pool that lists and stats subdirectories
+            ahead of the traversal; totals are the same either way
+        window (int): How many subdirectories of a directory the pool may work on ahead
+        should_stop (callable): Optional; checked before each directory, the scan
+            is abandoned once it returns True
+        progress (callable): Optional; called with the number of entries scanned
+            so far, about every 0.1 seconds
+        max_retained_entries (int): Most directory entries kept in listings
+        contexts (dict): Optional; filled with the context (see FilterPlan.child_context)
+            of every expanded directory, so rendering does not read its ignore files again
+        stats (TreeStats): Optional; gets the stat calls (one per file) and their time
+
+    Returns:
+        tuple: (totals, listings) where totals maps directory paths (as joined
+            from root_dir) to DirTotals, and listings maps the paths of expanded
+            directories to their entries or to the OSError raised listing them;
+            None if should_stop ended the scan
+    """
+    totals_plan = plan.for_totals()
+    totals = {}
+    listings = {}
+    retained = 0
+    scanned = 0
+    last_progress = time.perf_counter()
+    seen_links = set()
+    stack = []
+    timed = stats is not None
+
+    def _open(path, name, level, context, future=None):
+        # Returns the directory's frame, or None if it cannot be listed
+        nonlocal retained, scanned, last_progress
+        if contexts is not None and level <= max_depth:
+            contexts[path] = context
+        try:
+            if future is not None:
+                entries, dirs, size, file_count, newest, linked, stat_time = future.result()
+            else:
+                entries, dirs, size, file_count, newest, linked, stat_time = _scan_for_totals(
+                    totals_plan, lister, path, name, level == 0, context, timed
+                )
+        except OSError as e:
+            if level <= max_depth:
+                listings[path] = e
+            return None
+        scanned += len(entries)
+        if timed:
+            # Stats on the pool overlap the traversal, so they only come off the rollup time when sequential
+            stats.add_stats(file_count + len(linked), stat_time, "rollups" if executor is None else None)
+        if progress is not None:
+            now = time.perf_counter()
+            if now - last_progress >= _ROLLUP_PROGRESS_INTERVAL:
+                last_progress = now
+                progress(scanned)
+        if level <= max_depth and retained + len(entries) <= max_retained_entries:
+            listings[path] = entries
+            retained += len(entries)
+        for key, linked_size in linked:
+            if key not in seen_links:
+                seen_links.add(key)
+                size += linked_size
+                file_count += 1
+        # Each child's rules are worked out once, here, whether or not it is listed ahead
+        upcoming = (
+            (child, plan.child_context(context, child.name, child.path))
+            for child in dirs if not child.is_symlink()
+        )
+        frame = _RollupFrame(path, level, size, file_count, len(dirs), newest, upcoming)
+        if executor is not None:
+            for child, child_context in upcoming:
+                frame.pending.append((child, child_context, _submit(child, child_context)))
+                if len(frame.pending) >= window:
+                    break
+        return frame
+
+    def _submit(child, context):
+        return executor.submit(_scan_for_totals, totals_plan, lister, child.path, child.name, False, context, timed)
+
+    def _next_child(frame):
+        # The next subdirectory to descend into, with its context and future (if listed ahead)
+        if frame.pending:
+            item = frame.pending.popleft()
+            following = next(frame.upcoming, None)
+            if following is not None:
+                frame.pending.append((following[0], following[1], _submit(*following)))
+            return item
+        following = next(frame.upcoming, None)
+        if following is None:
+            return None
+        return following[0], following[1], None
+
+    frame = _open(root_dir, os.path.basename(root_dir), 0, plan.root_context(root_dir))
+    if frame is None:
+        return totals, listings
+    stack.append(frame)
+    while stack:
+        frame = stack[-1]
+        item = _next_child(frame)
+        if item is not None:
+            if should_stop is not None and should_stop():
+                for open_frame in stack:
+                    for pending in open_frame.pending:
+                        pending[2].cancel()
+                return None
+            child, child_context, future = item
+            child_frame = _open(child.path, child.name, frame.level + 1, child_context, future)
+            if child_frame is not None:
+                stack.append(child_frame)
+            elif frame.level + 1 <= max_depth + 1:
+                totals[child.path] = DirTotals(0, 0, 0)
+            continue
+        stack.pop()
+        # Only directories that appear in the tree need their totals kept
+        if frame.level <= max_depth + 1:
+            totals[frame.path] = DirTotals(frame.size, frame.files, frame.dirs, frame.newest)
+        if stack:
+            parent = stack[-1]
+            parent.size += frame.size
+            parent.files += frame.files
+            parent.dirs += frame.dirs
+            if frame.newest is not None and (parent.newest is None or frame.newest > parent.newest):
+                parent.newest = frame.newest
+    return totals, listings
+
+
+def _size_sort_key(totals):
+    # Largest first; directories by their total (by name without totals), files by their own size
+    def key(entry):
+        if entry.is_dir:
+            total = totals.get(entry.path) if totals is not None else None
+            size = total.size if total is not None else 0
+        else:
+            size = entry.size or 0
+        return (-size, entry.name.lower())
+    # Which entries the key would stat (see _list_children_timed), and whether
+    # that is every file of a fresh listing (no rollup pass stat-ed them)
+    key.needs_stat = lambda entry: not entry.is_dir and entry._size is None
+    key.stats_entries = totals is None
+    return key
+
+def _mtime_sort_key(totals):
+    # Newest first; directories by the newest file below them, files by their own mtime
+    def key(entry):
+        if entry.is_dir and totals is not None:
+            total = totals.get(entry.path)
+            mtime = total.mtime if total is not None else None
+        else:
+            mtime = entry.mtime
+        return (-(mtime or 0.0), entry.name.lower())
+    key.needs_stat = lambda entry: (totals is None or not entry.is_dir) and entry._mtime is None
+    key.stats_entries = totals is None
+    return key
+
+# Sort modes of the sort_mode setting; "size" and "mtime" order directories by
+# their rollup totals when size rollups are on, and by name / their own
+# modification time otherwise
+SORT_MODES = ("name", "natural", "extension", "size", "mtime")
+
+def make_sort_key(mode, totals=None):
+    """
+    Return the key function for a sort mode.
+
+    Keys only use metadata the traversal already has: names, and sizes and
+    modification times cached on the entries (by the rollup pass, which also
+    provides the directory totals). Without totals, directories are ordered
+    by name ("size") or by their own modification time ("mtime"), and the
+    entries are stat-ed as they are sorted; a listing that max_entries_per_dir
+    truncates is then cut in name order first, so only the shown entries are
+    stat-ed and sorted (see list_children).
+
+    Args:
+        mode (str): One of SORT_MODES (unknown modes sort by name)
+        totals (dict): DirTotals by directory path, from collect_size_rollups
+
+    Returns:
+        callable: A key function for list.sort
+    """
+    if mode == "natural":
+        return _natural_sort_key
+    if mode == "extension":
+        return _extension_sort_key
+    if mode == "size":
+        return _size_sort_key(totals)
+    if mode == "mtime":
+        return _mtime_sort_key(totals)
+    return _entry_sort_key
+
+def resolve_sort_mode(settings):
+    """Return the sort mode a run with these settings uses (sort_by_size predates sort_mode and still selects size order)."""
+    return "size" if settings.sort_by_size else settings.sort_mode
+
+def uses_size_rollups(settings):
+    """Whether a run with these settings totals directory sizes (see collect_size_rollups)."""
+    # Sort modes never add a pass of their own; "size" and "mtime" use the totals when they are computed anyway
+    return bool(settings.size_rollups or settings.show_sizes or settings.sort_by_size)
+
+def _root_display_name(root_dir):
+    # Get just the folder name instead of full path
+    root_name = os.path.basename(root_dir.rstrip(os.path.sep))
+    if not root_name:  # In case the path ends with a separator
+        root_name = os.path.basename(os.path.dirname(root_dir))
+    return root_name
+
+def parse_tree_depth(value):
+    """
+    Normalise a tree depth setting.
+
+    Args:
+        value: A number of levels, or -1 / None / "all" for unlimited depth
+
+    Returns:
+        The maximum level to expand (float('inf') when unlimited)
+    """
+    if value is None or value == float('inf') or (isinstance(value, str) and value.strip().lower() in ("all", "-1", "inf")):
+        return float('inf')
+    value = int(value)
+    return float('inf') if value < 0 else value
+
+class _Frame:
+    """An open directory on the traversal stack."""
+    __slots__ = ("path", "identity", "items", "index", "prefix", "level", "is_in_subdir", "context", "prefetch",
+                 "upcoming")
+
+    def __init__(self, path, items, prefix, level, is_in_subdir, context):
+        self.path = path
+        self.identity = None  # (st_dev, st_ino), see links_to_ancestor
+        self.items = items
+        self.index = 0
+        self.prefix = prefix
+        self.level = level
+        self.is_in_subdir = is_in_subdir
+        self.context = context
+        self.prefetch = None
+        self.upcoming = None
+
+class TreeFormat:
+    """
+    Formats tree lines from the emoji and indentation settings.
+
+    Shared by iter_tree_lines and the live tree (backend.watch) so both render
+    identical lines. This is the "box" style; subclasses change the glyphs
+    (see TREE_STYLES). Prefixes are cached per indentation string, so the
+    lines of a directory reuse the same prefix objects instead of
+    concatenating new ones for every entry.
+    """
+    root_prefix = ""
+    totals = None  # DirTotals by directory path, set by the traversal when sizes are shown
+    branch = "├───"  # Connector before an entry that has siblings after it
+    last = "└───"  # Connector before the last entry of a directory
+    pipe = "│   "  # Child indentation below an entry that has siblings after it
+    blank = "    "  # Child indentation below the last entry
+    escape = None  # Optional function applied to names (e.g. Markdown escaping)
+    _MAX_CACHED_PREFIXES = 4096
+
+    def __init__(self, settings):
+        self.root_emoji = settings.root_emoji
+        self.subdir_emoji = settings.subdir_emoji
+        self.extra_indent_text = " " * settings.extra_indent
+        self.show_sizes = settings.show_sizes
+        self._line_prefixes = {}  # prefix -> (line prefix when not last, line prefix when last)
+        self._child_prefixes = {}  # prefix -> (child prefix when not last, child prefix when last)
+
+    def root_line(self, root_dir):
         # Add root emoji if configured
-        buffer.write(f"{root_emoji}{root_name}\n")
+        name = _root_display_name(root_dir)
+        if self.escape is not None:
+            name = self.escape(name)
+        line = f"{self.root_emoji}{name}"
+        if self.show_sizes and self.totals is not None:
+            line += self._totals_suffix(root_dir)
+        return line
+
+    def _connectors(self, prefix):
+        if len(self._line_prefixes) >= self._MAX_CACHED_PREFIXES:
+            self._line_prefixes.clear()
+        connectors = self._line_prefixes[prefix] = (prefix + self.branch, prefix + self.last)
+        return connectors
+
+    def entry_line(self, prefix, is_last, entry, is_in_subdir):
+        # Prepare the line prefix
+        connectors = self._line_prefixes.get(prefix)
+        if connectors is None:
+            connectors = self._connectors(prefix)
+        line_prefix = connectors[is_last]
+        name = entry.name if self.escape is None else self.escape(entry.name)
+        if entry.is_dir:
+            # Always show subdirectory emoji for directories (except root)
+            line = f"{line_prefix}{self.subdir_emoji}{name}"
+            if self.show_sizes and self.totals is not None:
+                line += self._totals_suffix(entry.path)
+            return line
+        if not entry.is_file and isinstance(entry, TruncationSummary):
+            return f"{line_prefix}{entry.name}"
+        # Determine if we need extra indentation
+        extra_spacing = self.extra_indent_text if is_in_subdir and self.subdir_emoji else ""
+        if self.show_sizes:
+            return f"{line_prefix}{extra_spacing}{name}  ({format_size(entry.size)})"
+        return f"{line_prefix}{extra_spacing}{name}"
+
+    def needs_stat(self, entry):
+        """Whether entry_line would stat the entry (file sizes not fetched yet)."""
+        return self.show_sizes and entry.is_file and entry._size is None
+
+    def _totals_suffix(self, path):
+        total = self.totals.get(path)
+        if total is None:
+            # Symbolic links to directories are not followed when totalling
+            return ""
+        return f"  ({format_size(total.size)}, {total.files:,} file{'' if total.files == 1 else 's'})"
+
+    def error_line(self, prefix, is_last, error):
+        error_msg = "Access Denied" if error.errno == errno.EACCES else str(error)
+        return f"{prefix}{self.last if is_last else self.branch}{error_msg}"
+
+    def child_prefix(self, prefix, is_last, entry=None):
+        # Prepare the prefix for children
+        prefixes = self._child_prefixes.get(prefix)
+        if prefixes is None:
+            if len(self._child_prefixes) >= self._MAX_CACHED_PREFIXES:
+                self._child_prefixes.clear()
+            prefixes = self._child_prefixes[prefix] = (prefix + self.pipe, prefix + self.blank)
+        return prefixes[is_last]
+
+class AsciiTreeFormat(TreeFormat):
+    """The box style drawn with ASCII characters only."""
+    branch = "|---"
+    last = "`---"
+    pipe = "|   "
+
+class IndentTreeFormat(TreeFormat):
+    """Indentation only, without connecting lines."""
+    root_prefix = "    "
+    branch = ""
+    last = ""
+    pipe = "    "
+
+_MARKDOWN_SPECIAL = re.compile(r"([\\`*_\[\]<>#|])")
+
+def _markdown_escape(name):
+    return _MARKDOWN_SPECIAL.sub(r"\\\1", name)
+
+class MarkdownTreeFormat(TreeFormat):
+    """A nested Markdown bullet list, with the root as the top-level item."""
+    root_prefix = "  "
+    branch = "- "
+    last = "- "
+    pipe = "  "
+    blank = "  "
+    escape = staticmethod(_markdown_escape)
+
+    def root_line(self, root_dir):
+        return "- " + super().root_line(root_dir)
+
+# Line style name -> format class, see tree_style
+TREE_STYLES = {
+    "box": TreeFormat,
+    "ascii": AsciiTreeFormat,
+    "markdown": MarkdownTreeFormat,
+    "indent": IndentTreeFormat,
+}
+
+def make_tree_format(settings):
+    """Return the TreeFormat for the settings' tree_style (box for unknown styles)."""
+    return TREE_STYLES.get(settings.tree_style, TreeFormat)(settings)
+
+TreeRecord = namedtuple("TreeRecord", "path depth type size mtime error count", defaults=(None,))
+TreeRecord.__doc__ = """One entry of the tree as data: path is relative to the root with "/" separators (the root itself is "."), type is "directory", "file", "other", "error" or "truncated" (count entries left out by max_entries_per_dir)."""
+
+class RecordFormat:
+    """
+    Produces TreeRecord objects instead of text lines.
+
+    Used by iter_tree_records with the same traversal as iter_tree_lines; the
+    "prefix" threaded through the traversal is the (relative directory path,
+    depth) of the children being produced. With size rollups, directory
+    records carry their cumulative size.
+    """
+    root_prefix = ("", 1)
+    totals = None  # DirTotals by directory path; directory records get their total size
 
-        def _generate_tree(current_dir, prefix="", is_last=False, level=0, is_in_subdir=False):
-            if level > tree_depth:
+    def root_line(self, root_dir):
+        try:
+            mtime = os.stat(root_dir).st_mtime
+        except OSError:
+            mtime = None
+        return TreeRecord(".", 0, "directory", self._total_size(root_dir), mtime, None)
+
+    def _total_size(self, path):
+        total = self.totals.get(path) if self.totals is not None else None
+        return total.size if total is not None else None
+
+    def entry_line(self, prefix, is_last, entry, is_in_subdir):
+        if entry.is_dir:
+            kind, size = "directory", self._total_size(entry.path)
+        elif entry.is_file:
+            kind, size = "file", entry.size
+        elif isinstance(entry, TruncationSummary):
+            # size is the total of the hidden files, when known
+            return TreeRecord(prefix[0] + "…", prefix[1], "truncated", entry.size, None, None, entry.count)
+        else:
+            kind, size = "other", None
+        return TreeRecord(prefix[0] + entry.name, prefix[1], kind, size, entry.mtime, None)
+
+    @staticmethod
+    def needs_stat(entry):
+        """Whether entry_line would stat the entry (every entry has a modification time, files a size)."""
+        return isinstance(entry, ScanEntry) and (entry._mtime is None or (entry.is_file and entry._size is None))
+
+    def error_line(self, prefix, is_last, error):
+        # Reported in place of the children of the directory that could not be listed
+        error_msg = "Access Denied" if error.errno == errno.EACCES else str(error)
+        return TreeRecord(prefix[0].rstrip("/") or ".", prefix[1], "error", None, None, error_msg)
+
+    @staticmethod
+    def child_prefix(prefix, is_last, entry=None):
+        return (prefix[0] + entry.name + "/", prefix[1] + 1)
+
+def iter_tree_lines(root_dir, config=None, stats=None, scan=None, scan_cache=None, should_stop=None,
+                    rollup_progress=None):
+    """
+    Generate the directory tree one line at a time.
+
+    Lines are yielded as the traversal produces them, so callers can write or
+    display them incrementally without holding the whole tree in memory.
+
+    Args:
+        root_dir (str): The directory to generate the tree for
+        config (TreeConfig): Settings for this run (any object with the same attribute
+            names works); defaults to a snapshot of the module globals
+        stats (TreeStats): Optional collector, filled in as the traversal runs
+        scan (RetainedScan): Optional in-memory listings of root_dir from earlier
+            runs (see backend.retained_scan); listings are read from it instead of the disk
+        scan_cache (ScanCache): Optional open scan cache to use when use_scan_cache is
+            set, instead of opening scan_cache_path; the caller saves it
+        should_stop (callable): Optional; lets a caller cancel the size rollup pass,
+            which runs before the first line (see collect_size_rollups). No lines
+            are yielded once it returns True there
+        rollup_progress (callable): Optional; called with the number of entries
+            scanned so far while the size rollup pass runs
+
+    Yields:
+        str: The next line of the tree, without a trailing newline
+    """
+    settings = config if config is not None else TreeConfig()
+    return _iter_tree(root_dir, settings, make_tree_format(settings), stats, scan, scan_cache, should_stop,
+                      rollup_progress)
+
+def iter_tree_records(root_dir, config=None, stats=None, scan=None):
+    """
+    Generate the directory tree as TreeRecord objects, one per entry.
+
+    Uses the same traversal and filtering as iter_tree_lines, so records come
+    in the same order as the lines of the text tree (the root first).
+
+    Args:
+        root_dir (str): The directory to generate the tree for
+        config (TreeConfig): Settings for this run, see iter_tree_lines
+        stats (TreeStats): Optional collector, filled in as the traversal runs
+        scan (RetainedScan): Optional in-memory listings, see iter_tree_lines
+
+    Yields:
+        TreeRecord: The next entry of the tree
+    """
+    settings = config if config is not None else TreeConfig()
+    return _iter_tree(root_dir, settings, RecordFormat(), stats, scan)
+
+class _TimedFormat:
+    """Wraps a format to time the string building into TreeStats."""
+
+    def __init__(self, fmt, stats):
+        self.fmt = fmt
+        self.stats = stats
+        self.root_prefix = fmt.root_prefix
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        result = method(*args)
+        self.stats.times["formatting"] += time.perf_counter() - start
+        return result
+
+    def root_line(self, root_dir):
+        return self._timed(self.fmt.root_line, root_dir)
+
+    def entry_line(self, prefix, is_last, entry, is_in_subdir):
+        if entry.is_dir or entry.is_file:
+            self.stats.entries_shown += 1
+        if self.fmt.needs_stat(entry):
+            # Counted as a stat call, not as string building
+            start = time.perf_counter()
+            entry.fetch_metadata()
+            self.stats.add_stats(1, time.perf_counter() - start)
+        return self._timed(self.fmt.entry_line, prefix, is_last, entry, is_in_subdir)
+
+    def error_line(self, prefix, is_last, error):
+        return self._timed(self.fmt.error_line, prefix, is_last, error)
+
+    def child_prefix(self, prefix, is_last, entry=None):
+        return self._timed(self.fmt.child_prefix, prefix, is_last, entry)
+
+def _iter_tree(root_dir, settings, fmt, stats=None, scan=None, scan_cache=None, should_stop=None,
+               rollup_progress=None):
+    # Depth-first traversal shared by the text and record outputs; fmt turns
+    # each root, entry and listing error into the item that is yielded
+    started = time.perf_counter()
+    base_fmt = fmt
+    if stats is not None:
+        fmt = _TimedFormat(fmt, stats)
+    max_depth = parse_tree_depth(settings.tree_depth)
+    sort_mode = resolve_sort_mode(settings)
+    sort = settings.sort_alphabetically or sort_mode != "name"
+    sort_key = make_sort_key(sort_mode)
+    reverse = settings.sort_reverse
+    workers = settings.scan_workers
+    rollups = uses_size_rollups(settings)
+
+    # With size rollups the root line has to wait for the totals
+    if not rollups:
+        yield fmt.root_line(root_dir)
+
+    # Compile the filtering rules once for the whole run
+    plan = FilterPlan(settings)
+
+    # Optional on-disk cache of directory listings from earlier runs
+    cache = None
+    lister = scan_directory
+    if settings.use_scan_cache:
+        if scan_cache is not None:
+            # Shared with other runs (see iter_batch_results), which save it together
+            lister = scan_cache.listing
+        else:
+            from backend.scan_cache import ScanCache, default_cache_path
+            cache = ScanCache.open(settings.scan_cache_path or default_cache_path(), settings.scan_cache_max_entries)
+            lister = cache.listing
+    if scan is not None:
+        # Listings and ignore rules kept from earlier runs; the disk (or the cache) only fills the gaps
+        lister = scan.lister_for(lister)
+        plan.ignore_loader = scan.load_ignore_rules
+
+    # Optional thread pool that lists subdirectories ahead of the output
+    executor = None
+    if workers > 0:
+        # Imported on demand: concurrent.futures pulls in logging and slows down CLI startup
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(max_workers=workers)
+    prefetch_window = max(1, workers * _PREFETCH_PER_WORKER)
+
+    # Explicit stack of open directories instead of recursion: no recursion limit,
+    # and only one frame per level of the current path is kept
+    stack = []
+
+    def _enter(current_dir, dir_name, context, prefix, is_last, level, is_in_subdir, pending=None):
+        # Push a frame for a directory; returns an error line if it cannot be listed
+        try:
+            if pending is not None:
+                # Listing was already fetched by a worker thread
+                dirs, files = pending.result()
+            else:
+                dirs, files = list_children(plan, current_dir, dir_name, level == 0, context, sort, lister, sort_key,
+                                            stats, reverse)
+        except OSError as e:
+            return fmt.error_line(prefix, is_last, e)
+
+        # Combine sorted directories and files
+        all_items = dirs + files
+        if not all_items:
+            return None
+
+        frame = _Frame(current_dir, all_items, prefix, level, is_in_subdir, context)
+        # Queue the next subdirectories on the pool, keeping at most prefetch_window in flight
+        if executor is not None and level < max_depth:
+            frame.upcoming = iter(dirs)
+            frame.prefetch = deque()
+            for child in frame.upcoming:
+                frame.prefetch.append(_submit(child, context))
+                if len(frame.prefetch) >= prefetch_window:
+                    break
+        stack.append(frame)
+        return None
+
+    # Contexts of the expanded directories, worked out by the rollup pass when it runs
+    contexts = {}
+
+    def _child_context(context, child):
+        known = contexts.pop(child.path, None)
+        return known if known is not None else plan.child_context(context, child.name, child.path)
+
+    def _submit(child, context):
+        # Queued with the child's context, so that is only worked out once
+        child_context = _child_context(context, child)
+        return child_context, executor.submit(
+            list_children, plan, child.path, child.name, False, child_context, sort, lister, sort_key, stats, reverse
+        )
+
+    try:
+        if rollups:
+            # One bottom-up pass totals every directory and keeps the listings
+            # of the expanded ones, which the pass below then reads from memory
+            rollup_start = time.perf_counter()
+            rollups_result = collect_size_rollups(plan, root_dir, max_depth, lister, executor, prefetch_window,
+                                                  should_stop, rollup_progress, contexts=contexts, stats=stats)
+            if stats is not None:
+                stats.times["rollups"] += time.perf_counter() - rollup_start
+            if rollups_result is None:
                 return
+            totals, listings = rollups_result
+            base_fmt.totals = totals
+            disk_lister = lister
+
+            def lister(path):
+                listing = listings.pop(path, None)
+                if listing is None:
+                    # Not scanned above (e.g. behind a symbolic link)
+                    return disk_lister(path)
+                if isinstance(listing, OSError):
+                    raise listing
+                return listing
+
+            if sort_mode in ("size", "mtime"):
+                sort_key = make_sort_key(sort_mode, totals)
+            yield fmt.root_line(root_dir)
 
+        # Start from the root directory
+        root_context = contexts.pop(root_dir, None)
+        if root_context is None:
+            root_context = plan.root_context(root_dir)
+        error_line = _enter(root_dir, os.path.basename(root_dir), root_context, fmt.root_prefix, False, 0, False)
+        if error_line is not None:
+            yield error_line
+        while stack:
+            frame = stack[-1]
+            items = frame.items
+            index = frame.index
+            if index == len(items):
+                stack.pop()
+                continue
+            entry = items[index]
+            frame.index = index + 1
+            is_last_item = index == len(items) - 1
+            yield fmt.entry_line(frame.prefix, is_last_item, entry, frame.is_in_subdir)
+            if not entry.is_dir or frame.level >= max_depth:
+                continue
+
+            if frame.prefetch:
+                # Directories come first and in order, so the head of the queue is this one
+                child_context, child_pending = frame.prefetch.popleft()
+                next_child = next(frame.upcoming, None)
+                if next_child is not None:
+                    frame.prefetch.append(_submit(next_child, frame.context))
+            else:
+                child_context = _child_context(frame.context, entry)
+                child_pending = None
+            if links_to_ancestor(entry, stack):
+                # A symbolic link loop: shown, but not expanded
+                if child_pending is not None:
+                    child_pending.cancel()
+                continue
+            # Each level only adds the recursive rules its own name brings in;
+            # is_in_subdir is True for every level below the root
+            error_line = _enter(
+                entry.path, entry.name, child_context, fmt.child_prefix(frame.prefix, is_last_item, entry),
+                is_last_item, frame.level + 1, True, child_pending
+            )
+            if error_line is not None:
+                yield error_line
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if stats is not None:
+            stats.elapsed = time.perf_counter() - started
+        if cache is not None:
             try:
-                # Get all items and separate directories and files
-                items = os.listdir(current_dir)
-                dirs = []
-                files = []
-                
-                current_dir_name = os.path.basename(current_dir)
-                
-                for item in items:
-                    path = os.path.join(current_dir, item)
-                    if not should_include_item(item, path, current_dir_name, root_dir):
-                        continue
-                        
-                    if os.path.isdir(path):
-                        dirs.append(item)
-                    elif os.path.isfile(path) and show_files:
-                        files.append(item)
-                
-                # Sort directories and files separately if sorting is enabled
-                if sort_alphabetically:
-                    dirs.sort(key=str.lower)  # Case-insensitive sorting
-                    files.sort(key=str.lower)  # Case-insensitive sorting
-                
-                # Combine sorted directories and files
-                all_items = dirs + files
-                
-                if not all_items:
-                    return
-
-                for index, item in enumerate(all_items):
-                    is_last_item = index == len(all_items) - 1
-                    path = os.path.join(current_dir, item)
-                    is_dir = os.path.isdir(path)
-
-                    # Determine if we need extra indentation
-                    extra_spacing = " " * extra_indent if is_in_subdir and subdir_emoji else ""
-
-                    # Prepare the line prefix
-                    line_prefix = prefix + ('└───' if is_last_item else '├───')
-
-                    if is_dir:
-                        # Always show subdirectory emoji for directories (except root)
-                        buffer.write(f"{line_prefix}{subdir_emoji}{item}\n")
-                    else:  # Files
-                        buffer.write(f"{line_prefix}{extra_spacing}{item}\n")
-
-                    if is_dir:
-                        # Prepare the prefix for children
-                        new_prefix = prefix + ('    ' if is_last_item else '│   ')
-                        # Pass is_in_subdir=True for the next level if we're in a subdirectory or at root level
-                        _generate_tree(path, new_prefix, is_last_item, level + 1, True)
-
-            except OSError as e:
-                error_msg = "Access Denied" if e.errno == errno.EACCES else str(e)
-                buffer.write(f"{prefix}{'└───' if is_last else '├───'}{error_msg}\n")
-                return
+                cache.save()
+            except OSError:
+                pass  # A cache that cannot be written only costs a full scan next time
+
+def write_tree_file(root_dir, output_file, config=None, stats=None, scan=None, scan_cache=None):
+    """
+    Stream the directory tree straight into a file.
+
+    Memory use stays flat however large the tree is, since lines are written
+    as they are generated.
 
-        # Start the recursive generation from the root directory
-        _generate_tree(root_dir)
+    Args:
+        root_dir (str): The directory to generate the tree for
+        output_file (str): Path of the text file to write
+        config (TreeConfig): Settings for this run, see iter_tree_lines
+        stats (TreeStats): Optional collector, see iter_tree_lines
+        scan (RetainedScan): Optional in-memory listings, see iter_tree_lines
+        scan_cache (ScanCache): Optional open scan cache, see iter_tree_lines
+
+    Returns:
+        int: The number of lines written
+
+    Raises:
+        OSError: If the output file cannot be written
+    """
+    # Names that are not valid UTF-8 (surrogate-escaped by os.scandir) are written as "?", as on standard output
+    with open(output_file, "w", encoding="utf-8", errors="replace") as f:
+        return write_lines(iter_tree_lines(root_dir, config, stats, scan, scan_cache), f)
+
+# Lines joined into one write call by write_lines
+_WRITE_CHUNK_LINES = 4096
+
+def write_lines(lines, f):
+    """
+    Write lines to a text file in large chunks, each line followed by a newline.
+
+    Args:
+        lines (iterable): Lines without trailing newlines
+        f: Text file opened for writing
 
+    Returns:
+        int: The number of lines written
+    """
+    write = f.write
+    join = "\n".join
+    count = 0
+    chunk = []
+    append = chunk.append
+    for line in lines:
+        append(line)
+        if len(chunk) >= _WRITE_CHUNK_LINES:
+            count += len(chunk)
+            write(join(chunk))
+            write("\n")
+            chunk.clear()
+    if chunk:
+        count += len(chunk)
+        write(join(chunk))
+        write("\n")
+    return count
+
+def generate_directory_tree(root_dir, output_file="directory-structure.txt", config=None, with_stats=False):
+    # With with_stats=True, returns (text, TreeStats) instead of the text alone
+    stats = TreeStats() if with_stats else None
+    lines = []
+    error = ""
+    try:
+        lines.extend(iter_tree_lines(root_dir, config, stats))
     except Exception as e:
-        buffer.write(f"Error generating tree: {e}")
+        error = f"Error generating tree: {e}"
 
-    result = buffer.getvalue()
+    result = "\n".join(lines) + "\n" + error if lines else error
     
     # Write to file if requested
     if output_file:
         try:
-            with open(output_file, "w", encoding="utf-8") as f:
+            with open(output_file, "w", encoding="utf-8", errors="replace") as f:
                 f.write(result)
         except OSError as e:
             result += f"\nError writing to file: {output_file} - {e}"
     
+    if with_stats:
+        return result, stats
     return result
 
+BatchResult = namedtuple("BatchResult", "index root_dir text output_file line_count elapsed error")
+BatchResult.__doc__ = """Outcome of one batch job; text is None when the tree was written to output_file."""
+
+def _run_batch_job(index, job, scan_cache=None):
+    root_dir, config = job[0], job[1]
+    output_file = job[2] if len(job) > 2 else None
+    start = time.perf_counter()
+    try:
+        if output_file:
+            line_count = write_tree_file(root_dir, output_file, config, scan_cache=scan_cache)
+            text = None
+        else:
+            lines = list(iter_tree_lines(root_dir, config, scan_cache=scan_cache))
+            line_count = len(lines)
+            text = "\n".join(lines) + "\n"
+    except Exception as e:
+        return BatchResult(index, root_dir, None, output_file, 0, time.perf_counter() - start, e)
+    return BatchResult(index, root_dir, text, output_file, line_count, time.perf_counter() - start, None)
+
+def iter_batch_results(jobs, max_workers=4):
+    """
+    Generate many trees concurrently, yielding each result as soon as it is done.
+
+    Every job carries its own TreeConfig, so jobs never share settings. Jobs
+    that use the same scan cache file share one open ScanCache, which is saved
+    once after the last of them finishes, so no job overwrites the listings
+    saved by another.
+
+    Args:
+        jobs (iterable): (root_dir, config) or (root_dir, config, output_file) tuples;
+            config may be None for a snapshot of the module globals. With an
+            output_file the tree is streamed to disk instead of returned as text.
+        max_workers (int): Number of trees generated at the same time
+
+    Yields:
+        BatchResult: One per job, in completion order (see BatchResult.index)
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    jobs = list(jobs)
+    caches = {}  # Cache file path -> ScanCache shared by the jobs using it
+    job_caches = []
+    for job in jobs:
+        config = job[1] if job[1] is not None else TreeConfig()
+        cache = None
+        if config.use_scan_cache:
+            from backend.scan_cache import ScanCache, default_cache_path
+            cache_path = config.scan_cache_path or default_cache_path()
+            cache = caches.get(cache_path)
+            if cache is None:
+                cache = caches[cache_path] = ScanCache.open(cache_path, config.scan_cache_max_entries)
+        job_caches.append(cache)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = [
+                executor.submit(_run_batch_job, index, job, job_caches[index]) for index, job in enumerate(jobs)
+            ]
+            try:
+                for future in as_completed(futures):
+                    yield future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+    finally:
+        for cache in caches.values():
+            try:
+                cache.save()
+            except OSError:
+                pass  # A cache that cannot be written only costs a full scan next time
+
+def generate_tree_batch(jobs, max_workers=4):
+    """Generate many trees concurrently and return their BatchResults in job order."""
+    return sorted(iter_batch_results(jobs, max_workers), key=lambda result: result.index)
+
 if __name__ == "__main__":
     # Get the directory where the script is located
     script_directory = os.path.dirname(os.path.abspath(__file__))
-    generate_directory_tree(script_directory)  # Generate the tree
+    write_tree_file(script_directory, "directory-structure.txt")  # Generate the tree
     print(f"Directory tree generated and saved to directory-structure.txt")
\ No newline at end of file
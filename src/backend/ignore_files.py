@@ -0,0 +1,163 @@
+import os
+import re
+
+# .gitignore-style ignore files, compiled once per directory. Only the pattern
+# syntax is implemented here; which files are read and how their rules are
+# inherited by subdirectories is decided by FilterPlan (backend.generate_tree).
+
+# Follow the platform's file name case rules, as PatternSet does
+_FLAGS = re.IGNORECASE if os.path.normcase("A") == "a" else 0
+
+def _translate(pattern):
+    # Glob -> regex: "*" and "?" stop at "/", "**" spans directories
+    i = 0
+    n = len(pattern)
+    out = []
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**", i) and (i == 0 or pattern[i - 1] == "/"):
+                if i + 2 == n:
+                    # Trailing "/**": everything inside
+                    out.append(".*")
+                    i += 2
+                    continue
+                if pattern[i + 2] == "/":
+                    # "**/": zero or more directories
+                    out.append("(?:.*/)?")
+                    i += 3
+                    continue
+            while i + 1 < n and pattern[i + 1] == "*":
+                i += 1
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = i + 1
+            if j < n and pattern[j] in "!^":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 1
+            if j >= n:
+                out.append("\\[")
+            else:
+                content = pattern[i + 1:j].replace("\\", "\\\\")
+                if content[0] in "!^":
+                    content = "^" + content[1:]
+                out.append(f"[{content}]")
+                i = j
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+def _parse_line(line):
+    # Returns (regex source, negate, dir_only, anchored), or None for blank lines and comments
+    if not line or line.startswith("#"):
+        return None
+    # Trailing spaces are ignored unless escaped with a backslash
+    stripped = line.rstrip(" ")
+    if stripped.endswith("\\") and len(stripped) < len(line):
+        stripped += " "
+    line = stripped
+    negate = line.startswith("!")
+    if negate:
+        line = line[1:]
+    elif line.startswith("\\!") or line.startswith("\\#"):
+        line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    # A slash at the start or in the middle ties the pattern to the ignore file's directory
+    anchored = "/" in line
+    return _translate(line.lstrip("/")), negate, dir_only, anchored
+
+class IgnoreRules:
+    """
+    The compiled rules of one directory's ignore files.
+
+    Patterns follow .gitignore syntax: "#" comments, "!" negation, a trailing
+    "/" for directories only, patterns containing "/" matched against the
+    path relative to the ignore file's directory and other patterns against
+    the name alone, "*", "?", "[...]" and "**". The last matching rule wins.
+    """
+    __slots__ = ("rules", "_any_name", "_any_path")
+
+    def __init__(self, lines):
+        self.rules = []
+        name_sources = []
+        path_sources = []
+        for line in lines:
+            parsed = _parse_line(line)
+            if parsed is None:
+                continue
+            source, negate, dir_only, anchored = parsed
+            self.rules.append((re.compile(f"(?:{source})\\Z", _FLAGS), negate, dir_only, anchored))
+            (path_sources if anchored else name_sources).append(source)
+        # One regex per kind rejects most names without looking at the rules one by one
+        self._any_name = re.compile(f"(?:{'|'.join(name_sources)})\\Z", _FLAGS) if name_sources else None
+        self._any_path = re.compile(f"(?:{'|'.join(path_sources)})\\Z", _FLAGS) if path_sources else None
+
+    def match(self, rel_path, name, is_dir):
+        """
+        Check an entry against the rules.
+
+        Args:
+            rel_path (str): Path of the entry relative to the ignore file's directory, "/" separated
+            name (str): The entry's name
+            is_dir (bool): Whether the entry is a directory
+
+        Returns:
+            True if the entry is ignored, False if a "!" rule re-includes it,
+            None if no rule matches
+        """
+        if ((self._any_name is None or self._any_name.match(name) is None)
+                and (self._any_path is None or self._any_path.match(rel_path) is None)):
+            return None
+        for regex, negate, dir_only, anchored in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path if anchored else name):
+                return not negate
+        return None
+
+def load_ignore_rules(directory, file_names):
+    """
+    Read and compile the ignore files of one directory.
+
+    Args:
+        directory (str): The directory holding the ignore files
+        file_names (iterable): Ignore file names, in order; rules of later files
+            take precedence over earlier ones
+
+    Returns:
+        IgnoreRules, or None if there are no ignore files or they hold no rules
+    """
+    lines = []
+    for file_name in file_names:
+        try:
+            with open(os.path.join(directory, file_name), encoding="utf-8", errors="replace") as f:
+                lines.extend(f.read().splitlines())
+        except OSError:
+            continue
+    if not lines:
+        return None
+    rules = IgnoreRules(lines)
+    return rules if rules.rules else None
+
+def find_repository_root(path):
+    """Return the closest directory at or above path that contains .git, or None."""
+    current = os.path.abspath(path)
+    while True:
+        if os.path.exists(os.path.join(current, ".git")):
+            return current
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
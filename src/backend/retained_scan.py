@@ -0,0 +1,215 @@
+import os
+import threading
+from array import array
+from backend.generate_tree import ScanEntry, scan_directory
+
+# Bits of a retained entry's flags byte
+_IS_DIR = 1
+_IS_FILE = 2
+_IS_SYMLINK = 4
+_SYMLINK_UNKNOWN = 8  # Not given by the listing; checked on the disk when needed
+
+# Size and modification time not fetched yet (-1 means the stat call failed, as on ScanEntry)
+_UNKNOWN = -2
+
+class _Listing:
+    """One retained directory listing, stored column-wise."""
+    __slots__ = ("names", "flags", "sizes", "mtimes")
+
+    def __init__(self, names, flags, sizes, mtimes):
+        self.names = names  # array of indices into RetainedScan's string table
+        self.flags = flags  # bytearray of _IS_* bits
+        self.sizes = sizes  # array of sizes in bytes, or _UNKNOWN
+        self.mtimes = mtimes  # array of modification times, or _UNKNOWN
+
+class _RetainedEntry(ScanEntry):
+    """A ScanEntry served from a retained listing; sizes and times it fetches are written back."""
+    __slots__ = ("_listing", "_index", "_symlink", "_source")
+
+    def is_symlink(self):
+        if self._symlink is None:
+            self._symlink = ScanEntry.is_symlink(self)
+        return self._symlink
+
+    def _store(self, size, mtime):
+        ScanEntry._store(self, size, mtime)
+        listing = self._listing
+        listing.sizes[self._index] = self._size
+        listing.mtimes[self._index] = self._mtime
+        if self._source is not None:
+            # The entry it was retained from, e.g. one a ScanCache saves
+            self._source._store(size, mtime)
+
+class RetainedScan:
+    """
+    Unfiltered directory listings of one tree, kept in memory between runs.
+
+    Pass the same instance to several iter_tree_lines / iter_tree_records /
+    export_tree calls on root_dir: the first run lists the directories it
+    visits, later runs read those listings back instead of touching the disk.
+    Filtering, sorting, depth and formatting all happen after listing, so a
+    change to any of those settings only re-filters and re-renders. Sizes and
+    modification times fetched by one run are kept and reused by the next,
+    and so are the parsed ignore files (see load_ignore_rules).
+
+    Listings are stored compactly rather than as ScanEntry objects: every
+    name once in a shared string table, and per directory an array of name
+    indices, a byte of flags per entry and arrays of sizes and times (about
+    21 bytes per entry plus the distinct names). Fresh ScanEntry objects are
+    built each time a listing is served.
+
+    Directories that were never listed (e.g. previously excluded, or deeper
+    than the earlier depth) are listed on first use and retained too. Nothing
+    is re-read once retained, so create a new RetainedScan to pick up changes
+    on disk.
+
+    At most max_entries directory entries are retained; listings beyond that
+    are still served, straight from the disk.
+    """
+
+    def __init__(self, root_dir, max_entries=2_000_000):
+        self.root_dir = root_dir
+        self.max_entries = max_entries
+        self.entries = 0
+        self.hits = 0
+        self.misses = 0
+        self._listings = {}  # Directory path -> _Listing, or the OSError raised listing it
+        self._names = []  # String table: every distinct entry name once
+        self._name_ids = {}  # Name -> its index in _names
+        self._ignore_rules = {}  # (directory, ignore file names) -> IgnoreRules or None
+        self._lock = threading.Lock()
+
+    def lister_for(self, source=scan_directory):
+        """
+        Return a lister for the traversal that serves retained listings.
+
+        Args:
+            source (callable): Lists directories that are not retained yet
+                (scan_directory or ScanCache.listing)
+
+        Returns:
+            callable: Takes a directory path and returns its entries, raising
+                OSError (also from memory) if it cannot be listed
+        """
+        listings = self._listings
+
+        def listing(path):
+            retained = listings.get(path)
+            if retained is None:
+                try:
+                    entries = source(path)
+                except OSError as e:
+                    self._retain(path, e)
+                    raise
+                retained = self._retain(path, entries)
+                if retained is None:
+                    return entries
+                return self._entries(path, retained, entries)
+            self.hits += 1
+            if isinstance(retained, OSError):
+                raise retained
+            return self._entries(path, retained)
+
+        return listing
+
+    def load_ignore_rules(self, directory, file_names):
+        """
+        Return the parsed ignore files of a directory, reading them only the first time.
+
+        Same arguments and result as backend.ignore_files.load_ignore_rules; a
+        directory whose retained listing has none of the files is not opened.
+        """
+        key = (directory, file_names)
+        try:
+            return self._ignore_rules[key]
+        except KeyError:
+            pass
+        retained = self._listings.get(directory)
+        if isinstance(retained, _Listing) and not self._has_any(retained, file_names):
+            rules = None
+        else:
+            from backend.ignore_files import load_ignore_rules
+            rules = load_ignore_rules(directory, file_names)
+        with self._lock:
+            self._ignore_rules.setdefault(key, rules)
+        return rules
+
+    def _has_any(self, retained, file_names):
+        name_ids = self._name_ids
+        ids = {name_ids[name] for name in file_names if name in name_ids}
+        return bool(ids) and any(index in ids for index in retained.names)
+
+    def _retain(self, path, entries):
+        # Called from scan worker threads too; returns the stored _Listing, or
+        # None if the listing is an error or does not fit
+        size = 1 if isinstance(entries, OSError) else len(entries)
+        with self._lock:
+            self.misses += 1
+            if path in self._listings or self.entries + size > self.max_entries:
+                return None
+            if isinstance(entries, OSError):
+                self._listings[path] = entries
+                self.entries += size
+                return None
+            names = array("I")
+            flags = bytearray(size)
+            sizes = array("q")
+            mtimes = array("d")
+            name_ids = self._name_ids
+            table = self._names
+            for i, entry in enumerate(entries):
+                index = name_ids.get(entry.name)
+                if index is None:
+                    index = name_ids[entry.name] = len(table)
+                    table.append(entry.name)
+                names.append(index)
+                bits = (_IS_DIR if entry.is_dir else 0) | (_IS_FILE if entry.is_file else 0)
+                if entry._entry is None:
+                    bits |= _SYMLINK_UNKNOWN
+                elif entry.is_symlink():
+                    bits |= _IS_SYMLINK
+                flags[i] = bits
+                sizes.append(_UNKNOWN if entry._size is None else entry._size)
+                mtimes.append(_UNKNOWN if entry._mtime is None else entry._mtime)
+            listing = _Listing(names, flags, sizes, mtimes)
+            self._listings[path] = listing
+            self.entries += size
+        return listing
+
+    def _entries(self, path, listing, sources=None):
+        # Builds the ScanEntry objects of a retained listing; on its first use the
+        # DirEntry objects of the listed entries (sources) are passed on too
+        prefix = os.path.join(path, "")
+        table = self._names
+        flags = listing.flags
+        sizes = listing.sizes
+        mtimes = listing.mtimes
+        entries = []
+        append = entries.append
+        new = _RetainedEntry.__new__
+        for i, name_id in enumerate(listing.names):
+            name = table[name_id]
+            bits = flags[i]
+            entry = new(_RetainedEntry)
+            entry.name = name
+            entry.path = prefix + name
+            entry.is_dir = bool(bits & _IS_DIR)
+            entry.is_file = bool(bits & _IS_FILE)
+            size = sizes[i]
+            entry._size = None if size == _UNKNOWN else size
+            mtime = mtimes[i]
+            entry._mtime = None if mtime == _UNKNOWN else mtime
+            entry._listing = listing
+            entry._index = i
+            entry._symlink = None if bits & _SYMLINK_UNKNOWN else bool(bits & _IS_SYMLINK)
+            if sources is None:
+                entry._entry = None
+                entry._source = None
+            else:
+                entry._entry = sources[i]._entry
+                entry._source = sources[i]
+            append(entry)
+        return entries
+
+    def __len__(self):
+        return len(self._listings)
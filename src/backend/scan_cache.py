@@ -0,0 +1,186 @@
+import os
+import marshal
+import threading
+from collections import OrderedDict
+from backend.generate_tree import ScanEntry, scan_directory
+
+# Bump when the on-disk layout changes; older cache files are then ignored
+CACHE_VERSION = 1
+
+def default_cache_path():
+    """Return the per-user location of the scan cache file."""
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "DirectoryTreeGenerator", "scan-cache.bin")
+
+def _directory_key(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_ino, st.st_dev)
+
+class ScanCache:
+    """
+    On-disk cache of directory listings keyed by directory mtime.
+
+    Each directory's listing (names, types and any sizes fetched during the
+    run) is stored under its absolute path together with the directory's
+    (st_mtime_ns, st_ino, st_dev). A later run stats the directory once and
+    reuses the cached listing when that key is unchanged, instead of listing
+    it and stat-ing its files again.
+
+    A directory's mtime only changes when entries are added, removed or
+    renamed, so sizes of files modified in place can be stale; call
+    invalidate() to force a full rescan.
+
+    The cache holds at most max_entries directory entries in total; the least
+    recently used listings are evicted first.
+
+    save() only writes the file when something changed since it was opened: a
+    directory was listed from disk, a listing was dropped, or a size was
+    fetched for an entry served from the cache.
+    """
+
+    def __init__(self, path, max_entries=2_000_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._listings = OrderedDict()  # abspath -> (key, entries); entries are tuples or ScanEntry objects
+        self._total_entries = 0
+        self._dirty = False
+        self._served = {}  # abspath -> number of entries with a known size when served from the cache
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path, max_entries=2_000_000):
+        """Load the cache from path; a missing or unreadable file gives an empty cache."""
+        cache = cls(path, max_entries)
+        try:
+            with open(path, "rb") as f:
+                version, listings = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return cache
+        if version != CACHE_VERSION:
+            return cache
+        for dir_path, key, entries in listings:
+            cache._listings[dir_path] = (key, entries)
+            cache._total_entries += len(entries)
+        cache._evict()
+        return cache
+
+    def listing(self, path):
+        """
+        Return the entries of a directory, from the cache when it is still valid.
+
+        Args:
+            path (str): The directory to list
+
+        Returns:
+            list: ScanEntry objects for every item in the directory
+
+        Raises:
+            OSError: If the directory cannot be listed
+        """
+        # Stat before listing, so a change made during the scan invalidates the entry next time
+        key = _directory_key(path)
+        cache_key = os.path.abspath(path)
+        with self._lock:
+            cached = self._listings.get(cache_key)
+            if cached is not None and cached[0] == key:
+                self._listings.move_to_end(cache_key)
+                self.hits += 1
+                entries = cached[1]
+                if cache_key not in self._served:
+                    self._served[cache_key] = _known_sizes(entries)
+                if entries and not isinstance(entries[0], ScanEntry):
+                    entries = [
+                        ScanEntry(name, os.path.join(path, name), is_dir, is_file, size=size)
+                        for name, is_dir, is_file, size in entries
+                    ]
+                    # Keep the objects so sizes fetched during this run are saved too
+                    self._listings[cache_key] = (key, entries)
+                return entries
+            self.misses += 1
+
+        entries = scan_directory(path)
+        with self._lock:
+            previous = self._listings.pop(cache_key, None)
+            if previous is not None:
+                self._total_entries -= len(previous[1])
+            self._listings[cache_key] = (key, entries)
+            self._total_entries += len(entries)
+            self._dirty = True
+            self._evict()
+        return entries
+
+    def invalidate(self, path=None):
+        """Drop the cached listings for path and everything below it, or the whole cache if path is None."""
+        with self._lock:
+            if path is None:
+                self._dirty = self._dirty or bool(self._listings)
+                self._listings.clear()
+                self._total_entries = 0
+                return
+            root = os.path.abspath(path)
+            prefix = root.rstrip(os.path.sep) + os.path.sep
+            for dir_path in [p for p in self._listings if p == root or p.startswith(prefix)]:
+                self._total_entries -= len(self._listings.pop(dir_path)[1])
+                self._dirty = True
+
+    def save(self):
+        """
+        Write the cache to disk atomically, if it changed.
+
+        Returns:
+            bool: Whether the file was written
+        """
+        with self._lock:
+            if not self._dirty and not self._sizes_added():
+                return False
+            listings = [
+                (dir_path, key, _serialize(entries))
+                for dir_path, (key, entries) in self._listings.items()
+            ]
+            # Changes made from here on belong to the next save
+            self._dirty = False
+            self._served = {key: _known_sizes(self._listings[key][1]) for key in self._served if key in self._listings}
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Unique per writer, since several runs may save the same cache concurrently
+            temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                marshal.dump((CACHE_VERSION, listings), f)
+            os.replace(temp_path, self.path)
+        except OSError:
+            self._dirty = True
+            raise
+        return True
+
+    def _sizes_added(self):
+        # Sizes fetched during the run are cached on the served entries
+        for cache_key, known in self._served.items():
+            cached = self._listings.get(cache_key)
+            if cached is not None and _known_sizes(cached[1]) > known:
+                return True
+        return False
+
+    def _evict(self):
+        while self._total_entries > self.max_entries and self._listings:
+            _, (_, entries) = self._listings.popitem(last=False)
+            self._total_entries -= len(entries)
+            self._dirty = True
+
+def _known_sizes(entries):
+    if entries and isinstance(entries[0], ScanEntry):
+        return sum(1 for e in entries if e._size is not None)
+    return sum(1 for entry in entries if entry[3] is not None)
+
+def _serialize(entries):
+    if entries and isinstance(entries[0], ScanEntry):
+        return tuple((e.name, e.is_dir, e.is_file, e._size) for e in entries)
+    return entries
+
+def clear_scan_cache(path=None):
+    """Delete the scan cache file (the default location if path is None)."""
+    try:
+        os.remove(path or default_cache_path())
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,446 @@
+import os
+import sys
+import errno
+import time
+import select
+import struct
+import threading
+from backend.generate_tree import (
+    FilterPlan, TreeConfig, links_to_ancestor, list_children, make_sort_key, make_tree_format, parse_tree_depth,
+    resolve_sort_mode,
+)
+
+class _DirNode:
+    """A displayed directory whose children are kept in memory for live updates."""
+    __slots__ = ("path", "identity", "name", "context", "level", "prefix", "is_last", "is_in_subdir",
+                 "parent", "listing", "items", "line_count")
+
+    def __init__(self, path, name, context, level, prefix, is_last, is_in_subdir, parent):
+        self.path = path
+        self.identity = None  # (st_dev, st_ino), see links_to_ancestor
+        self.name = name
+        self.context = context
+        self.level = level
+        self.prefix = prefix  # Prefix of this directory's child lines
+        self.is_last = is_last
+        self.is_in_subdir = is_in_subdir
+        self.parent = parent
+        self.listing = None  # (dirs, files) from list_children, or the OSError raised while listing
+        self.items = []  # Rendered child lines (str) and expanded child directories (_DirNode)
+        self.line_count = 0  # Lines in this directory's block, including nested blocks
+
+class LiveTree:
+    """
+    In-memory directory tree that can patch individual subtrees.
+
+    After the initial build every displayed directory keeps its filtered
+    listing and rendered lines. apply_changes() re-lists only the directories
+    reported as changed, re-renders their blocks from memory and returns the
+    line ranges that differ, so callers never re-walk the whole root.
+    """
+
+    def __init__(self, root_dir, config=None):
+        settings = config if config is not None else TreeConfig()
+        self.root_dir = root_dir
+        self.max_depth = parse_tree_depth(settings.tree_depth)
+        # Without size totals, size and mtime order fall back to per-entry metadata (see make_sort_key)
+        sort_mode = resolve_sort_mode(settings)
+        self.sort = settings.sort_alphabetically or sort_mode != "name"
+        self.sort_key = make_sort_key(sort_mode)
+        self.sort_reverse = settings.sort_reverse
+        self.plan = FilterPlan(settings)
+        self.format = make_tree_format(settings)
+        # Size totals are not maintained incrementally, so live trees are shown without sizes
+        self.format.show_sizes = False
+        self.root_line = self.format.root_line(root_dir)
+        self.root = _DirNode(root_dir, os.path.basename(root_dir), self.plan.root_context(root_dir),
+                             0, "", False, False, None)
+        self._nodes = {}  # path -> _DirNode for every expanded directory
+        self._added = []
+        self._removed = []
+        self._lock = threading.Lock()
+
+    def build(self, should_stop=None):
+        """
+        Scan the whole tree once.
+
+        Args:
+            should_stop (callable): Optional check called per directory; returning True abandons the build
+
+        Returns:
+            bool: True if the build completed
+        """
+        with self._lock:
+            self._nodes = {}
+            self._index(self.root)
+            return self._render(self.root, relist=True, should_stop=should_stop)
+
+    def iter_lines(self):
+        """Yield the current lines of the tree, root line first."""
+        yield self.root_line
+        yield from self._flatten(self.root)
+
+    def paths(self):
+        """Return the paths of all expanded directories (the ones worth watching)."""
+        with self._lock:
+            return list(self._nodes)
+
+    def drain_watch_changes(self):
+        """Return and reset the directories expanded and dropped since the last call."""
+        with self._lock:
+            added = [p for p in self._added if p in self._nodes]
+            removed = [p for p in self._removed if p not in self._nodes]
+            self._added, self._removed = [], []
+            return added, removed
+
+    def apply_changes(self, changed_paths):
+        """
+        Re-list changed directories and re-render their blocks.
+
+        Args:
+            changed_paths (iterable): Directories whose contents changed
+
+        Returns:
+            list: Patches as (start_line, removed_count, new_lines) tuples, to apply in order
+        """
+        patches = []
+        with self._lock:
+            nodes = [self._nodes[p] for p in set(changed_paths) if p in self._nodes]
+            # Ancestors first, so a descendant dropped by its parent's update is skipped
+            nodes.sort(key=lambda n: n.level)
+            for node in nodes:
+                if self._nodes.get(node.path) is not node:
+                    continue
+                start = self._block_start(node)
+                old_lines = list(self._flatten(node))
+                old_count = node.line_count
+                self._render(node, relist=True)
+                delta = node.line_count - old_count
+                parent = node.parent
+                while parent is not None:
+                    parent.line_count += delta
+                    parent = parent.parent
+                new_lines = list(self._flatten(node))
+                patch = _diff_block(start, old_lines, new_lines)
+                if patch is not None:
+                    patches.append(patch)
+        return patches
+
+    def _render(self, node, relist=False, should_stop=None):
+        # Walk the affected subtree with an explicit stack (trees can be deeper than the
+        # recursion limit), then total the line counts bottom-up
+        completed = True
+        rendered = []
+        stack = [(node, relist)]
+        while stack:
+            current, current_relist = stack.pop()
+            if self._render_items(current, current_relist, should_stop, stack):
+                rendered.append(current)
+            else:
+                completed = False
+        for current in reversed(rendered):
+            current.line_count = sum(
+                item.line_count if isinstance(item, _DirNode) else 1 for item in current.items
+            )
+        return completed
+
+    def _render_items(self, node, relist, should_stop, stack):
+        # Rebuild node.items; child directories needing a (re-)render are pushed onto stack
+        if relist or node.listing is None:
+            if should_stop is not None and should_stop():
+                return False
+            # The directory may have been replaced, so it is stat-ed again when next needed
+            node.identity = None
+            try:
+                node.listing = list_children(self.plan, node.path, node.name, node.level == 0,
+                                             node.context, self.sort, sort_key=self.sort_key,
+                                             reverse=self.sort_reverse)
+            except OSError as e:
+                node.listing = e
+
+        fmt = self.format
+        old_children = {item.name: item for item in node.items if isinstance(item, _DirNode)}
+        items = []
+        if isinstance(node.listing, OSError):
+            items.append(fmt.error_line(node.prefix, node.is_last, node.listing))
+        else:
+            dirs, files = node.listing
+            all_items = dirs + files
+            expand = node.level < self.max_depth
+            for index, entry in enumerate(all_items):
+                is_last_item = index == len(all_items) - 1
+                items.append(fmt.entry_line(node.prefix, is_last_item, entry, node.is_in_subdir))
+                if not (entry.is_dir and expand) or links_to_ancestor(entry, _ancestors(node)):
+                    continue
+                child_prefix = fmt.child_prefix(node.prefix, is_last_item)
+                child = old_children.pop(entry.name, None)
+                if child is None:
+                    child = _DirNode(entry.path, entry.name, self.plan.child_context(node.context, entry.name, entry.path),
+                                     node.level + 1, child_prefix, is_last_item, True, node)
+                    self._index(child)
+                    stack.append((child, False))
+                elif child.prefix != child_prefix or child.is_last != is_last_item:
+                    # Position changed: re-render from the kept listings, without touching disk
+                    child.prefix = child_prefix
+                    child.is_last = is_last_item
+                    stack.append((child, False))
+                items.append(child)
+        for dropped in old_children.values():
+            self._forget(dropped)
+        node.items = items
+        return True
+
+    def _index(self, node):
+        self._nodes[node.path] = node
+        self._added.append(node.path)
+
+    def _forget(self, node):
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if self._nodes.get(current.path) is current:
+                del self._nodes[current.path]
+                self._removed.append(current.path)
+            stack.extend(item for item in current.items if isinstance(item, _DirNode))
+
+    def _block_start(self, node):
+        # The root block starts after the root line; add the lines before each ancestor
+        position = 1
+        while node.parent is not None:
+            for item in node.parent.items:
+                if item is node:
+                    break
+                position += item.line_count if isinstance(item, _DirNode) else 1
+            else:
+                raise ValueError(f"{node.path} is not part of the tree")
+            node = node.parent
+        return position
+
+    def _flatten(self, node):
+        stack = [iter(node.items)]
+        while stack:
+            for item in stack[-1]:
+                if isinstance(item, _DirNode):
+                    stack.append(iter(item.items))
+                    break
+                yield item
+            else:
+                stack.pop()
+
+def _ancestors(node):
+    while node is not None:
+        yield node
+        node = node.parent
+
+def _diff_block(start, old_lines, new_lines):
+    # Trim the unchanged head and tail so only differing lines are replaced
+    head = 0
+    limit = min(len(old_lines), len(new_lines))
+    while head < limit and old_lines[head] == new_lines[head]:
+        head += 1
+    tail = 0
+    while (tail < limit - head
+           and old_lines[len(old_lines) - 1 - tail] == new_lines[len(new_lines) - 1 - tail]):
+        tail += 1
+    removed = len(old_lines) - head - tail
+    added = new_lines[head:len(new_lines) - tail]
+    if not removed and not added:
+        return None
+    return (start + head, removed, added)
+
+# inotify constants (see <sys/inotify.h>)
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_ONLYDIR
+_EVENT_HEADER = struct.Struct("iIII")
+
+class _InotifySource:
+    """
+    Reports changed directories using Linux inotify (through ctypes).
+
+    Directories that cannot get a watch (e.g. ENOSPC once the per-user
+    limit fs.inotify.max_user_watches is reached) are polled instead.
+    """
+
+    def __init__(self, poll_interval=1.0):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self._fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._get_errno = ctypes.get_errno
+        self._paths = {}  # watch descriptor -> path
+        self._watches = {}  # path -> watch descriptor
+        self._polled = _PollingSource(poll_interval)  # Directories inotify_add_watch failed for
+        self.overflowed = False
+
+    def add(self, path):
+        wd = self._add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+        if wd >= 0:
+            self._paths[wd] = path
+            self._watches[path] = wd
+            return
+        error = self._get_errno()
+        if error not in (errno.ENOENT, errno.ENOTDIR):
+            # A directory that is gone needs no watch; any other failure falls back to polling
+            self._polled.add(path)
+
+    def remove(self, path):
+        wd = self._watches.pop(path, None)
+        if wd is not None:
+            self._paths.pop(wd, None)
+            self._rm_watch(self._fd, wd)
+        else:
+            self._polled.remove(path)
+
+    def wait(self, timeout):
+        # Polled directories are only stat-ed once their interval has passed
+        changed = self._polled.wait(0)
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return changed
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size + name_length
+            if mask & _IN_Q_OVERFLOW:
+                # Events were lost; the caller rescans every watched directory
+                self.overflowed = True
+            elif mask & _IN_IGNORED:
+                path = self._paths.pop(wd, None)
+                if path is not None:
+                    self._watches.pop(path, None)
+            elif wd in self._paths:
+                changed.add(self._paths[wd])
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+class _PollingSource:
+    """Reports changed directories by polling their mtime (portable fallback)."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._keys = {}
+        self._next_poll = time.monotonic() + interval
+        self.overflowed = False
+
+    @staticmethod
+    def _key(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_ino)
+
+    def add(self, path):
+        self._keys[path] = self._key(path)
+
+    def remove(self, path):
+        self._keys.pop(path, None)
+
+    def wait(self, timeout):
+        # Callers wake up more often than interval (to flush debounced changes);
+        # the directories are only stat-ed once interval has passed
+        remaining = self._next_poll - time.monotonic()
+        if remaining > 0:
+            time.sleep(min(timeout, remaining))
+            if time.monotonic() < self._next_poll:
+                return set()
+        self._next_poll = time.monotonic() + self.interval
+        changed = set()
+        for path, key in list(self._keys.items()):
+            current = self._key(path)
+            if current != key:
+                self._keys[path] = current
+                changed.add(path)
+        return changed
+
+    def close(self):
+        pass
+
+class TreeWatcher:
+    """
+    Keeps a LiveTree up to date in a background thread.
+
+    Change notifications come from inotify on Linux and from mtime polling
+    elsewhere, or for directories inotify cannot watch (polling only sees
+    entries being added, removed or renamed).
+    Changes are coalesced per directory and applied once no new change has
+    arrived for `debounce` seconds (or after `max_delay` at the latest). Each
+    resulting patch is passed to on_patch(start_line, removed_count, new_lines).
+    """
+
+    def __init__(self, tree, on_patch, debounce=0.3, max_delay=2.0, poll_interval=1.0, use_inotify=None):
+        self.tree = tree
+        self.on_patch = on_patch
+        self.debounce = debounce
+        self.max_delay = max_delay
+        if use_inotify is None:
+            use_inotify = sys.platform.startswith("linux")
+        self._source = None
+        if use_inotify:
+            try:
+                self._source = _InotifySource(poll_interval)
+            except (OSError, AttributeError):
+                self._source = None
+        if self._source is None:
+            self._source = _PollingSource(poll_interval)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="TreeWatcher", daemon=True)
+
+    def start(self):
+        self.tree.drain_watch_changes()
+        for path in self.tree.paths():
+            self._source.add(path)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._source.close()
+
+    def _run(self):
+        pending = set()
+        first_change = last_change = 0.0
+        while not self._stop.is_set():
+            changed = self._source.wait(self.debounce / 2)
+            if self._source.overflowed:
+                self._source.overflowed = False
+                changed = set(self.tree.paths())
+            now = time.monotonic()
+            if changed:
+                if not pending:
+                    first_change = now
+                pending |= changed
+                last_change = now
+            if pending and (now - last_change >= self.debounce or now - first_change >= self.max_delay):
+                patches = self.tree.apply_changes(pending)
+                pending = set()
+                added, removed = self.tree.drain_watch_changes()
+                for path in removed:
+                    self._source.remove(path)
+                for path in added:
+                    self._source.add(path)
+                for patch in patches:
+                    self.on_patch(*patch)
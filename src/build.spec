@@ -15,7 +15,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['tkinter'],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -24,20 +24,18 @@ a = Analysis(
 )
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
+# One-folder build: a onefile EXE unpacks itself to a temp directory on every
+# launch, which dominated cold-start time. Ship the folder (or an installer) instead.
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='DirectoryTreeGenerator',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -45,6 +43,16 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
     icon='resources/icons/app_icon.ico',
-    onefile=True,
-    windowed=True,
-)
\ No newline at end of file
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    strip=False,
+    # UPX-compressed Qt libraries must be decompressed on every load
+    upx=False,
+    upx_exclude=[],
+    name='DirectoryTreeGenerator',
+)
@@ -3,31 +3,196 @@ import os
 import getpass
 import re
 import json
+import time
+import atexit
+import threading
+from collections import deque
 from datetime import datetime
 
 LOG_DIR = os.path.join(os.path.dirname(__file__), '..', 'logs')
-os.makedirs(LOG_DIR, exist_ok=True)
 LOG_FILE = os.path.join(LOG_DIR, 'Logs.json')
 
-USERNAME = getpass.getuser()
-USER_HOME = os.path.expanduser('~')
+# Rotation: Logs.json is moved to Logs.json.1 (and so on) once it passes MAX_LOG_BYTES
+MAX_LOG_BYTES = 1024 * 1024
+BACKUP_COUNT = 3
+
+# Entries waiting to be written. Low-priority entries are dropped once the buffer
+# holds MAX_BUFFERED entries; errors may use ERROR_RESERVE more before they are dropped too.
+MAX_BUFFERED = 10000
+ERROR_RESERVE = 1000
+FLUSH_INTERVAL = 0.5
+WRITE_SLICE = 500
+
+# Levels that are never dropped while there is room in the reserve
+HIGH_PRIORITY_LEVELS = frozenset(('ERROR', 'CRITICAL'))
+# Debug entries are dropped first, once the buffer is half full
+DEBUG_LIMIT = MAX_BUFFERED // 2
+
+# Resolved on the first log call rather than at import, to keep startup fast
+_redact_pattern = None
+_redact_replacements = None
+
+def _compile_redaction():
+    global _redact_pattern, _redact_replacements
+    username = getpass.getuser()
+    user_home = os.path.expanduser('~')
+    # Home first: it usually contains the username
+    replacements = {}
+    for value, placeholder in ((user_home, '<USER_HOME>'), (username, '<USERNAME>')):
+        if value and value not in replacements:
+            replacements[value] = placeholder
+    _redact_replacements = replacements
+    _redact_pattern = re.compile('|'.join(map(re.escape, replacements))) if replacements else None
 
 # Redact sensitive info (usernames, home paths)
 def redact(text):
     if not isinstance(text, str):
         return text
-    text = re.sub(re.escape(USER_HOME), '<USER_HOME>', text)
-    text = re.sub(re.escape(USERNAME), '<USERNAME>', text)
-    return text
+    if _redact_replacements is None:
+        _compile_redaction()
+    if _redact_pattern is None:
+        return text
+    return _redact_pattern.sub(lambda m: _redact_replacements[m.group(0)], text)
+
+class _LogWriter:
+    """
+    Writes log entries to LOG_FILE from a background thread.
+
+    Callers only append (time, level, message) to a bounded buffer; the thread
+    formats, redacts and writes whatever has accumulated in one batch, keeps
+    the file open between batches and rotates it by size. When the buffer is
+    full, entries are dropped instead of blocking the caller, and a summary of
+    the dropped count is written with the next batch.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._buffer = deque()
+        self._cond = threading.Condition(threading.Lock())
+        self._dropped = 0
+        self._pending = 0  # Entries taken from the buffer but not yet written
+        self._thread = None
+        self._stopping = False
+        self._file = None
+
+    def submit(self, level, message):
+        with self._cond:
+            if level in HIGH_PRIORITY_LEVELS:
+                limit = MAX_BUFFERED + ERROR_RESERVE
+            elif level == 'DEBUG':
+                limit = DEBUG_LIMIT
+            else:
+                limit = MAX_BUFFERED
+            if len(self._buffer) >= limit:
+                self._dropped += 1
+                return
+            self._buffer.append((time.time(), level, message))
+            if self._thread is None:
+                self._start()
+            elif len(self._buffer) == 1:
+                self._cond.notify()
+
+    def flush(self, timeout=5.0):
+        """Wait until everything submitted so far has been written."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify()
+            while (self._buffer or self._pending) and self._thread is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(5.0)
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._buffer and not self._dropped and not self._stopping:
+                    self._cond.wait(FLUSH_INTERVAL)
+                batch = self._buffer
+                self._buffer = deque()
+                dropped = self._dropped
+                self._dropped = 0
+                self._pending = len(batch)
+                stopping = self._stopping
+            if batch or dropped:
+                try:
+                    self._write(batch, dropped)
+                except OSError:
+                    pass  # Logging must never take the app down
+            with self._cond:
+                self._pending = 0
+                self._cond.notify_all()
+                if stopping and not self._buffer:
+                    break
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, batch, dropped):
+        lines = []
+        for timestamp, level, message in batch:
+            lines.append(json.dumps({
+                'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+                'level': level,
+                'message': redact(message)
+            }))
+        if dropped:
+            lines.append(json.dumps({
+                'timestamp': datetime.now().isoformat(),
+                'level': 'WARNING',
+                'message': f"{dropped} log entries dropped (log buffer full)"
+            }))
+        # Written in slices so a large batch cannot push a file far past MAX_LOG_BYTES
+        for start in range(0, len(lines), WRITE_SLICE):
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write('\n'.join(lines[start:start + WRITE_SLICE]) + '\n')
+            if self._file.tell() >= MAX_LOG_BYTES:
+                self._rotate()
+        if self._file is not None:
+            self._file.flush()
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for index in range(BACKUP_COUNT - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if BACKUP_COUNT > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+_writer = _LogWriter(LOG_FILE)
 
 def log_json(level, message):
-    entry = {
-        'timestamp': datetime.now().isoformat(),
-        'level': level,
-        'message': redact(message)
-    }
-    with open(LOG_FILE, 'a', encoding='utf-8') as f:
-        f.write(json.dumps(entry) + '\n')
+    # Never blocks: the entry is written by the background writer
+    _writer.submit(level, message)
+
+def flush_logs(timeout=5.0):
+    """Block until queued log entries are on disk (e.g. before packaging the logs)."""
+    return _writer.flush(timeout)
+
+def log_files():
+    """Return the existing log files, newest first."""
+    paths = [LOG_FILE] + [f"{LOG_FILE}.{index}" for index in range(1, BACKUP_COUNT + 1)]
+    return [path for path in paths if os.path.exists(path)]
 
 # Logger interface for app code
 def log_error(message):
@@ -36,6 +201,10 @@ def log_error(message):
 def log_user(message):
     log_json('INFO', message)
 
+def log_debug(message):
+    # Lowest priority; the first to be dropped when the buffer fills up
+    log_json('DEBUG', message)
+
 # For compatibility with previous usage
 def get_error_logger():
     class DummyLogger:
@@ -47,4 +216,4 @@ def get_user_logger():
     class DummyLogger:
         def info(self, msg, *args):
             log_user(msg % args if args else msg)
-    return DummyLogger()
\ No newline at end of file
+    return DummyLogger()
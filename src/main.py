@@ -1,20 +1,102 @@
+import time
+_START = time.perf_counter()
+
 import sys
 import os
-from PySide6.QtWidgets import QApplication
-from PySide6.QtGui import QIcon
-from ui.main_window import MainWindow
+
+# Time from main.py starting to the main window's first paint that
+# --profile-startup reports as on target
+STARTUP_TARGET_MS = 1000
+
+class StartupProfile:
+    """
+    Records startup phase timings for --profile-startup.
+
+    Each mark() stores the time since main.py started executing. report()
+    prints the phases, the modules that were loaded eagerly, and whether the
+    first paint happened within STARTUP_TARGET_MS.
+    """
+
+    # Modules that should only be loaded on first use
+    LAZY_MODULES = (
+        "ui.settings_dialog", "ui.tree_worker", "backend.generate_tree", "backend.retained_scan",
+        "logger", "zipfile", "webbrowser", "concurrent.futures",
+    )
+
+    def __init__(self):
+        self.marks = []
+        self._last = _START
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.marks.append((name, (now - self._last) * 1000, (now - _START) * 1000))
+        self._last = now
+
+    def report(self, stream):
+        print("Startup profile (ms)", file=stream)
+        print(f"  {'phase':<28}{'step':>10}{'total':>10}", file=stream)
+        for name, step, total in self.marks:
+            print(f"  {name:<28}{step:>10.1f}{total:>10.1f}", file=stream)
+        loaded = [name for name in self.LAZY_MODULES if name in sys.modules]
+        print(f"  modules loaded: {len(sys.modules)}", file=stream)
+        print(f"  lazy modules loaded at startup: {', '.join(loaded) or 'none'}", file=stream)
+        total = self.marks[-1][2] if self.marks else 0.0
+        verdict = "OK" if total <= STARTUP_TARGET_MS else "SLOW"
+        print(f"  time to window: {total:.1f} ms (target {STARTUP_TARGET_MS} ms) {verdict}", file=stream)
+
+def _install_first_paint_hook(window, profile, app):
+    # Report once the window has painted for the first time, then quit
+    from PySide6.QtCore import QObject, QEvent, QTimer
+
+    class FirstPaintFilter(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and obj is window:
+                window.removeEventFilter(self)
+                profile.mark("first paint")
+                QTimer.singleShot(0, app.quit)
+            return False
+
+    window._first_paint_filter = FirstPaintFilter(window)
+    window.installEventFilter(window._first_paint_filter)
 
 def main():
+    profile = StartupProfile() if "--profile-startup" in sys.argv[1:] else None
+
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtGui import QIcon
+    if profile:
+        profile.mark("import PySide6")
+    from ui.main_window import MainWindow
+    if profile:
+        profile.mark("import main window")
+
     app = QApplication(sys.argv)
-    
+
     # Set application icon for taskbar
     icon_path = os.path.join(os.path.dirname(__file__), 'resources', 'icons', 'app_icon.ico')
     if os.path.exists(icon_path):
         app.setWindowIcon(QIcon(icon_path))
-    
+    if profile:
+        profile.mark("create application")
+
     window = MainWindow()
+    if profile:
+        profile.mark("build main window")
+        _install_first_paint_hook(window, profile, app)
     window.show()
+    if profile:
+        profile.mark("show")
+        app.exec()
+        # Windowed builds have no console; fall back to a file next to the logs
+        if sys.stderr is not None:
+            profile.report(sys.stderr)
+        else:
+            report_path = os.path.join(os.path.dirname(__file__), '..', 'startup-profile.txt')
+            with open(report_path, 'w', encoding='utf-8') as f:
+                profile.report(f)
+        window.close()
+        sys.exit(0)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,19 +1,22 @@
 import os
 import json
+import time
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, 
-    QPushButton, QSpinBox, QCheckBox, QTextEdit, QLabel, 
+    QPushButton, QSpinBox, QCheckBox, QLabel, 
     QFileDialog, QStatusBar
 )
-from PySide6.QtCore import QSettings, Qt
-from PySide6.QtGui import QIcon, QFont, QTextCursor
-from ui.settings_dialog import SettingsDialog
-from backend.generate_tree import generate_directory_tree
+from PySide6.QtCore import QSettings, Qt, Signal
+from PySide6.QtGui import QIcon, QFont
+from ui.tree_view import TreeOutputView
 from PySide6.QtWidgets import QApplication
 # Import the custom menu bar
 from ui.menu_bar import create_menu_bar
 
 class MainWindow(QMainWindow):
+    # Live-mode patches arrive from the watcher thread: (start line, removed count, new lines)
+    tree_patched = Signal(int, int, list)
+    
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Directory Tree Generator")
@@ -27,9 +30,20 @@ class MainWindow(QMainWindow):
         # Set up the menu bar
         self.menuBar = create_menu_bar(self)
         self.setMenuBar(self.menuBar)
+        # Set before setup_ui: loading the saved options fires the change handlers
+        self.worker = None
+        self.watcher = None
+        self.export_worker = None
+        # Root and settings of the tree on screen, for exports
+        self.tree_root = None
+        self.tree_config = None
+        # Listings from the last Generate Tree; option changes re-render from them
+        self.retained_scan = None
+        self._rerender_pending = False
         self.setup_ui()
         self.load_settings()
         self.advanced_settings = self.load_advanced_settings()
+        self.tree_patched.connect(self.apply_tree_patch)
         
     def setup_ui(self):
         # Create central widget
@@ -55,8 +69,10 @@ class MainWindow(QMainWindow):
         depth_layout = QVBoxLayout()
         depth_layout.addWidget(QLabel("Depth"))
         self.depth_spin = QSpinBox()
-        self.depth_spin.setRange(0, 10)
+        self.depth_spin.setRange(-1, 9999)
+        self.depth_spin.setSpecialValueText("All")  # -1 = unlimited depth
         self.depth_spin.setValue(2)
+        self.depth_spin.valueChanged.connect(self.rerender_tree)
         depth_layout.addWidget(self.depth_spin)
         
         # Checkboxes
@@ -66,11 +82,17 @@ class MainWindow(QMainWindow):
         self.subdir_files_cb.setChecked(True)
         self.sort_cb = QCheckBox("Sort Alphabetically")
         self.sort_cb.setChecked(True)
+        self.live_cb = QCheckBox("Live Update")
+        self.live_cb.setToolTip("Keep the tree up to date as files change")
+        self.live_cb.toggled.connect(self.live_toggled)
+        for checkbox in (self.show_files_cb, self.subdir_files_cb, self.sort_cb):
+            checkbox.toggled.connect(self.rerender_tree)
         
         options_layout.addLayout(depth_layout)
         options_layout.addWidget(self.show_files_cb)
         options_layout.addWidget(self.subdir_files_cb)
         options_layout.addWidget(self.sort_cb)
+        options_layout.addWidget(self.live_cb)
         
         # Buttons
         btn_layout = QHBoxLayout()
@@ -79,19 +101,34 @@ class MainWindow(QMainWindow):
         self.generate_btn.setStyleSheet("background-color: #4CAF50; color: white; font-weight: bold;")
         self.generate_btn.clicked.connect(self.generate_tree)
         
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setFixedHeight(40)
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_generation)
+        
         settings_btn = QPushButton("Settings")
         settings_btn.setFixedHeight(40)
         settings_btn.clicked.connect(self.open_settings)
         
         btn_layout.addWidget(self.generate_btn)
+        btn_layout.addWidget(self.cancel_btn)
         btn_layout.addWidget(settings_btn)
         
         # Output area
         output_layout = QVBoxLayout()
         output_layout.addWidget(QLabel("Directory Tree Output:"))
         
-        self.output_area = QTextEdit()
-        self.output_area.setReadOnly(True)
+        # Search box: filters the output to matching entries and their parents as you type
+        search_layout = QHBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search entries...")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.textChanged.connect(self.search_tree)
+        search_layout.addWidget(QLabel("Search:"))
+        search_layout.addWidget(self.search_input)
+        
+        # Only the visible lines are laid out, so multi-million-line trees stay responsive
+        self.output_area = TreeOutputView()
         self.output_area.setFont(QFont("Consolas", 10))
         
         # Save and Copy buttons
@@ -110,6 +147,7 @@ class MainWindow(QMainWindow):
         main_layout.addLayout(options_layout)
         main_layout.addLayout(btn_layout)
         main_layout.addLayout(output_layout)
+        main_layout.addLayout(search_layout)
         main_layout.addWidget(self.output_area)
         main_layout.addLayout(btns_layout)
         
@@ -131,6 +169,7 @@ class MainWindow(QMainWindow):
         self.show_files_cb.setChecked(settings.value("show_files", "true") == "true")
         self.subdir_files_cb.setChecked(settings.value("show_subdir_files", "true") == "true")
         self.sort_cb.setChecked(settings.value("sort_alphabetically", "true") == "true")
+        self.live_cb.setChecked(settings.value("live_update", "false") == "true")
     
     def save_settings(self):
         settings = QSettings("YourCompany", "DirectoryTreeGenerator")
@@ -139,6 +178,7 @@ class MainWindow(QMainWindow):
         settings.setValue("show_files", self.show_files_cb.isChecked())
         settings.setValue("show_subdir_files", self.subdir_files_cb.isChecked())
         settings.setValue("sort_alphabetically", self.sort_cb.isChecked())
+        settings.setValue("live_update", self.live_cb.isChecked())
     
     def load_advanced_settings(self):
         settings = QSettings("YourCompany", "DirectoryTreeGenerator")
@@ -146,10 +186,19 @@ class MainWindow(QMainWindow):
             "root_emoji": settings.value("root_emoji", "🌐"),
             "subdir_emoji": settings.value("subdir_emoji", "📁"),
             "extra_indent": int(settings.value("extra_indent", 0)),
+            "tree_style": settings.value("tree_style", "box"),
+            "show_sizes": str(settings.value("show_sizes", "false")).lower() == "true",
+            # Older versions stored a sort_by_size flag instead of a sort mode
+            "sort_mode": settings.value(
+                "sort_mode", "size" if str(settings.value("sort_by_size", "false")).lower() == "true" else "name"
+            ),
+            "sort_reverse": str(settings.value("sort_reverse", "false")).lower() == "true",
+            "max_entries_per_dir": int(settings.value("max_entries_per_dir", 0)),
             "exclude_folders": json.loads(settings.value("exclude_folders", '["node_modules", ".git", "venv"]')),
             "exclude_patterns": json.loads(settings.value("exclude_patterns", '["#", "~"]')),
             "min_file_size": int(settings.value("min_file_size", 0)),
             "max_file_size": settings.value("max_file_size", "inf"),
+            "use_ignore_files": str(settings.value("use_ignore_files", "false")).lower() == "true",
             "exclude_folders_in_dirs": self.parse_dict_setting(settings, "exclude_folders_in_dirs", {}),
             "exclude_files_in_dirs": self.parse_dict_setting(settings, "exclude_files_in_dirs", {}),
             "only_show_files_with_specific_char_indir": self.parse_dict_setting(settings, "only_show_files_with_specific_char_indir", {}),
@@ -158,7 +207,10 @@ class MainWindow(QMainWindow):
             "exclude_files_in_dirs_recursive": self.parse_dict_setting(settings, "exclude_files_in_dirs_recursive", {}),
             "only_show_files_with_specific_char_indir_recursive": self.parse_dict_setting(settings, "only_show_files_with_specific_char_indir_recursive", {}),
             "only_show_folders_with_specific_char_indir_recursive": self.parse_dict_setting(settings, "only_show_folders_with_specific_char_indir_recursive", {}),
-            "directory_rules": self.parse_dict_setting(settings, "directory_rules", [])
+            "directory_rules": self.parse_dict_setting(settings, "directory_rules", []),
+            "scan_workers": int(settings.value("scan_workers", 0)),
+            "use_scan_cache": str(settings.value("use_scan_cache", "false")).lower() == "true",
+            "collect_stats": str(settings.value("collect_stats", "false")).lower() == "true"
         }
     
     def parse_dict_setting(self, settings, key, default):
@@ -183,83 +235,197 @@ class MainWindow(QMainWindow):
                 qsettings.setValue(key, value)
     
     def open_settings(self):
+        # Loaded on first use to keep startup fast
+        from ui.settings_dialog import SettingsDialog
         dialog = SettingsDialog(self.advanced_settings, self)
         if dialog.exec():
             self.advanced_settings = dialog.get_settings()
             self.save_advanced_settings(self.advanced_settings)
             self.status_bar.showMessage("Settings updated")
+            self.rerender_tree()
     
     def generate_tree(self):
+        if self.worker is not None:
+            return
         dir_path = self.dir_input.text()
         if not dir_path or not os.path.isdir(dir_path):
             self.status_bar.showMessage("Please select a valid directory")
             return
-        from backend import generate_tree
-        generate_tree.tree_depth = self.depth_spin.value()
-        generate_tree.show_subdirectory_files = self.subdir_files_cb.isChecked()
-        generate_tree.sort_alphabetically = self.sort_cb.isChecked()
-        generate_tree.show_files = self.show_files_cb.isChecked()
-        # Convert directory_rules to backend dicts
-        exclude_folders_in_dirs = {}
-        exclude_files_in_dirs = {}
-        for rule in self.advanced_settings.get("directory_rules", []):
-            d = rule["directory"]
-            pat = rule["pattern"]
-            rec = rule.get("recursive", False)
-            if rule["type"] == "exclude_folder":
-                if d not in exclude_folders_in_dirs:
-                    exclude_folders_in_dirs[d] = []
-                exclude_folders_in_dirs[d].append(pat)
-            elif rule["type"] == "exclude_file":
-                if d not in exclude_files_in_dirs:
-                    exclude_files_in_dirs[d] = []
-                exclude_files_in_dirs[d].append(pat)
-            elif rule["type"] == "exclude_file_and_folder":
-                if d not in exclude_folders_in_dirs:
-                    exclude_folders_in_dirs[d] = []
-                if d not in exclude_files_in_dirs:
-                    exclude_files_in_dirs[d] = []
-                exclude_folders_in_dirs[d].append(pat)
-                exclude_files_in_dirs[d].append(pat)
-        generate_tree.exclude_folders_in_dirs = exclude_folders_in_dirs
-        generate_tree.exclude_files_in_dirs = exclude_files_in_dirs
-        # Apply other advanced settings
-        for key, value in self.advanced_settings.items():
-            if key in ("exclude_folders_in_dirs", "exclude_files_in_dirs"):
-                continue
-            if hasattr(generate_tree, key):
-                setattr(generate_tree, key, value)
-        try:
-            tree_output = generate_directory_tree(dir_path, output_file=None)
-            self.output_area.clear()
-            self.output_area.setPlainText(tree_output)
-            self.output_area.moveCursor(QTextCursor.Start)
-            self.status_bar.showMessage(f"Tree generated for: {dir_path}")
-        except Exception as e:
-            self.status_bar.showMessage(f"Error: {str(e)}")
+        from backend.retained_scan import RetainedScan
+        from logger import get_user_logger
+        get_user_logger().info("User clicked Generate Tree")
+        # Always a fresh scan here; live mode keeps its own listings
+        self.retained_scan = None if self.live_cb.isChecked() else RetainedScan(dir_path)
+        self.start_generation(dir_path)
+    
+    def rerender_tree(self):
+        # An option changed: re-filter and re-render the retained scan without touching the disk
+        if self.retained_scan is None or self.live_cb.isChecked():
+            return
+        if self.worker is not None:
+            # Restarted from generation_finished once the current run has stopped
+            self._rerender_pending = True
+            self.worker.cancel()
+            return
+        self.start_generation(self.retained_scan.root_dir)
+    
+    def start_generation(self, dir_path):
+        self.stop_watching()
+        # The backend is loaded on first use to keep startup fast
+        from backend.generate_tree import TreeConfig
+        from ui.tree_worker import TreeWorker
+        # Each run gets its own settings object; the backend's module globals are left alone
+        config = TreeConfig.from_settings(self.advanced_settings).replace(
+            tree_depth=self.depth_spin.value(),
+            show_subdirectory_files=self.subdir_files_cb.isChecked(),
+            sort_alphabetically=self.sort_cb.isChecked(),
+            show_files=self.show_files_cb.isChecked()
+        )
+        self.tree_root = dir_path
+        self.tree_config = config
+        # Generate in a background thread and show lines as they arrive
+        self.search_input.clear()
+        self.output_area.tree_model.clear()
+        self.output_area.tree_model.search_index.set_emoji(config.root_emoji, config.subdir_emoji)
+        self.worker = TreeWorker(dir_path, config, live=self.live_cb.isChecked(), scan=self.retained_scan,
+                                 collect_stats=self.advanced_settings.get("collect_stats", False), parent=self)
+        self.worker.lines_ready.connect(self.append_tree_lines)
+        self.worker.progress.connect(self.show_generation_progress)
+        self.worker.rollup_progress.connect(lambda entries: self.status_bar.showMessage(
+            f"Totalling folder sizes... {entries:,} entries"
+        ))
+        self.worker.completed.connect(self.generation_completed)
+        self.worker.cancelled.connect(lambda entries: self.status_bar.showMessage(
+            f"Generation cancelled after {entries:,} entries"
+        ))
+        self.worker.failed.connect(lambda message: self.status_bar.showMessage(f"Error: {message}"))
+        self.worker.live_tree_ready.connect(self.start_watching)
+        self.worker.finished.connect(self.generation_finished)
+        self.generate_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.status_bar.showMessage(f"Generating tree for: {dir_path}...")
+        self.worker.start()
+    
+    def generation_completed(self, entries, elapsed):
+        message = f"Tree generated for: {self.worker.root_dir} ({entries:,} entries in {elapsed:.2f}s)"
+        if self.worker.stats is not None:
+            # Where the time went, to spot slow phases without a profiler
+            message += f" | {self.worker.stats.summary()}"
+        self.status_bar.showMessage(message)
+    
+    def append_tree_lines(self, text):
+        self.output_area.tree_model.append_text(text)
+    
+    def show_generation_progress(self, entries, rate):
+        self.status_bar.showMessage(f"Scanning... {entries:,} entries ({rate:,.0f} entries/s)")
+    
+    def cancel_generation(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.status_bar.showMessage("Cancelling...")
+    
+    def generation_finished(self):
+        self.worker.deleteLater()
+        self.worker = None
+        self.generate_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        self.output_area.scrollToTop()
+        if self.search_input.text():
+            # Pick up the lines that arrived after the last keystroke
+            self.search_tree(self.search_input.text())
+        if self._rerender_pending:
+            self._rerender_pending = False
+            self.rerender_tree()
+    
+    def start_watching(self, tree):
+        from backend.watch import TreeWatcher
+        if not self.live_cb.isChecked():
+            return
+        self.watcher = TreeWatcher(tree, self.tree_patched.emit)
+        self.watcher.start()
+    
+    def stop_watching(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+    
+    def live_toggled(self, checked):
+        if not checked:
+            self.stop_watching()
+    
+    def apply_tree_patch(self, start, removed_count, lines):
+        self.output_area.tree_model.replace_lines(start, removed_count, lines)
+        self.status_bar.showMessage(f"Tree updated ({removed_count} line(s) replaced by {len(lines)})")
+        if self.search_input.text():
+            self.search_tree(self.search_input.text())
+    
+    def search_tree(self, query):
+        if not query:
+            self.output_area.clear_search()
+            return
+        # Served from the index built while the tree was generated
+        start = time.perf_counter()
+        rows, matches, complete = self.output_area.tree_model.search(query)
+        self.output_area.show_search_results(rows, matches)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if complete:
+            message = f"{len(matches):,} matching entries"
+        else:
+            message = f"Showing the first {len(matches):,} matching entries"
+        self.status_bar.showMessage(f"{message} for \"{query}\" ({elapsed_ms:.0f} ms)")
     
     def save_tree(self):
-        if not self.output_area.toPlainText():
+        if not self.output_area.tree_model.rowCount():
             self.status_bar.showMessage("No tree to save")
             return
+        from backend.export import EXPORT_FORMATS, format_for_path
         
-        file_path, _ = QFileDialog.getSaveFileName(
+        filters = [dialog_filter for _, _, dialog_filter in EXPORT_FORMATS.values()]
+        file_path, selected_filter = QFileDialog.getSaveFileName(
             self, 
             "Save Directory Tree", 
             "", 
-            "Text Files (*.txt);;All Files (*)"
+            ";;".join(filters + ["All Files (*)"])
         )
+        if not file_path:
+            return
         
-        if file_path:
+        # The chosen filter decides the format; "All Files" goes by the extension
+        export_format = next(
+            (name for name, (_, _, dialog_filter) in EXPORT_FORMATS.items() if dialog_filter == selected_filter),
+            None
+        ) or format_for_path(file_path)
+        if export_format == "text":
             try:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(self.output_area.toPlainText())
+                with open(file_path, 'wb') as f:
+                    self.output_area.tree_model.write_to(f)
                 self.status_bar.showMessage(f"Tree saved to: {file_path}")
             except Exception as e:
                 self.status_bar.showMessage(f"Save error: {str(e)}")
+            return
+        
+        # Record formats are streamed from a fresh traversal with the same settings
+        if self.export_worker is not None:
+            self.status_bar.showMessage("An export is already running")
+            return
+        from ui.tree_worker import ExportWorker
+        self.export_worker = ExportWorker(self.tree_root, file_path, export_format, self.tree_config,
+                                          scan=self.retained_scan, parent=self)
+        self.export_worker.completed.connect(lambda count, elapsed: self.status_bar.showMessage(
+            f"Tree exported to: {file_path} ({count:,} records in {elapsed:.2f}s)"
+        ))
+        self.export_worker.failed.connect(lambda message: self.status_bar.showMessage(f"Save error: {message}"))
+        self.export_worker.finished.connect(self.export_finished)
+        self.status_bar.showMessage(f"Exporting {export_format.upper()} to: {file_path}...")
+        self.export_worker.start()
+    
+    def export_finished(self):
+        self.export_worker.deleteLater()
+        self.export_worker = None
     
     def copy_tree(self):
-        text = self.output_area.toPlainText()
+        text = self.output_area.tree_model.text()
         if not text:
             self.status_bar.showMessage("No tree to copy")
             return
@@ -268,5 +434,11 @@ class MainWindow(QMainWindow):
         self.status_bar.showMessage("Tree copied to clipboard")
     
     def closeEvent(self, event):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.wait()
+        if self.export_worker is not None:
+            self.export_worker.wait()
+        self.stop_watching()
         self.save_settings()
         event.accept()
\ No newline at end of file
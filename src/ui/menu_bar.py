@@ -2,9 +2,6 @@ from PySide6.QtGui import QAction, QDesktopServices
 from PySide6.QtCore import QUrl
 from PySide6.QtWidgets import QMenuBar, QMenu, QMessageBox, QPushButton
 import os
-import zipfile
-import webbrowser
-from logger import get_error_logger, get_user_logger
 
 # Creates and returns the main menu bar for the application
 # Includes Help, About, and Check for Updates options
@@ -29,13 +26,19 @@ def create_menu_bar(parent=None):
     # Feedback action: compress logs and open GitHub issues
     feedback_action = QAction("Feedback", menu_bar)
     def send_feedback():
-        logs_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'logs'))
+        # Feedback tooling is only loaded when it is used
+        import zipfile
+        import webbrowser
+        from logger import LOG_DIR, flush_logs, log_files
+        logs_dir = os.path.abspath(LOG_DIR)
         os.makedirs(logs_dir, exist_ok=True)  # Ensure logs directory exists
-        logs_json = os.path.join(logs_dir, 'Logs.json')
         zip_path = os.path.join(logs_dir, 'logs.zip')
+        # Entries are written in the background; make sure they are all on disk
+        flush_logs()
+        logs = log_files()
         
         # If no logs exist
-        if not os.path.exists(logs_json):
+        if not logs:
             msg = QMessageBox(parent)
             msg.setWindowTitle("Feedback")
             msg.setText("No logs are available to report, but you can still open an issue.")
@@ -48,7 +51,8 @@ def create_menu_bar(parent=None):
 
         # If logs exist
         with zipfile.ZipFile(zip_path, 'w') as zipf:
-            zipf.write(logs_json, arcname='Logs.json')
+            for log_path in logs:
+                zipf.write(log_path, arcname=os.path.basename(log_path))
         
         msg = QMessageBox(parent)
         msg.setWindowTitle("Feedback")
@@ -63,7 +67,4 @@ def create_menu_bar(parent=None):
     help_menu.addAction(feedback_action)
 
     menu_bar.addMenu(help_menu)
-    return menu_bar 
-
-user_logger = get_user_logger()
-user_logger.info("User clicked Generate Tree") 
\ No newline at end of file
+    return menu_bar
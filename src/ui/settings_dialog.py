@@ -161,6 +161,8 @@ class SettingsDialog(QDialog):
         self.create_exclusion_tab()
         # Create directory rules tab
         self.create_directory_rules_tab()
+        # Create performance tab
+        self.create_performance_tab()
         
         # Buttons
         btn_layout = QHBoxLayout()
@@ -192,6 +194,40 @@ class SettingsDialog(QDialog):
         layout.addRow("Subdirectory Emoji:", self.subdir_emoji_edit)
         layout.addRow("Extra Indentation:", self.extra_indent_spin)
         
+        # Values match backend.generate_tree.TREE_STYLES
+        self.tree_style_combo = QComboBox()
+        for label, style in (("Box drawing (├───)", "box"), ("ASCII (|---)", "ascii"),
+                             ("Markdown list", "markdown"), ("Indentation only", "indent")):
+            self.tree_style_combo.addItem(label, style)
+        index = self.tree_style_combo.findData(self.settings.get("tree_style", "box"))
+        self.tree_style_combo.setCurrentIndex(max(0, index))
+        layout.addRow("Line Style:", self.tree_style_combo)
+        
+        # Size totals come from the same scan as the tree (hard links counted once)
+        self.show_sizes_cb = QCheckBox("Show folder totals and file sizes")
+        self.show_sizes_cb.setChecked(self.settings.get("show_sizes", False))
+        layout.addRow("Sizes:", self.show_sizes_cb)
+        
+        # Values match backend.generate_tree.SORT_MODES; size and mtime order folders by their contents when size rollups are on
+        self.sort_mode_combo = QComboBox()
+        for label, mode in (("Name", "name"), ("Name, numbers in order (file2 before file10)", "natural"),
+                            ("Extension", "extension"), ("Size, largest first", "size"),
+                            ("Last modified, newest first", "mtime")):
+            self.sort_mode_combo.addItem(label, mode)
+        index = self.sort_mode_combo.findData(self.settings.get("sort_mode", "name"))
+        self.sort_mode_combo.setCurrentIndex(max(0, index))
+        self.sort_reverse_cb = QCheckBox("Reverse order")
+        self.sort_reverse_cb.setChecked(self.settings.get("sort_reverse", False))
+        layout.addRow("Sort By:", self.sort_mode_combo)
+        layout.addRow("", self.sort_reverse_cb)
+        
+        # Huge folders are cut off after this many entries, with one summary line for the rest
+        self.max_entries_spin = QSpinBox()
+        self.max_entries_spin.setRange(0, 1000000)
+        self.max_entries_spin.setSpecialValueText("No limit")
+        self.max_entries_spin.setValue(self.settings.get("max_entries_per_dir", 0))
+        layout.addRow("Max Entries per Folder:", self.max_entries_spin)
+        
         self.tabs.addTab(tab, "Formatting")
     
     def create_exclusion_tab(self):
@@ -260,6 +296,11 @@ class SettingsDialog(QDialog):
         size_layout.addRow("Max File Size (bytes):", self.max_size_spin)
         size_layout.addRow("", self.max_size_inf_cb)
         
+        # Rules from .gitignore / .ignore files found while scanning
+        self.use_ignore_files_cb = QCheckBox("Skip files and folders ignored by .gitignore / .ignore files")
+        self.use_ignore_files_cb.setChecked(self.settings.get("use_ignore_files", False))
+        size_layout.addRow("Ignore Files:", self.use_ignore_files_cb)
+        
         # Assemble tab
         layout.addLayout(folder_layout)
         layout.addLayout(pattern_layout)
@@ -310,6 +351,40 @@ class SettingsDialog(QDialog):
         # Connect selection change to update button states
         self.rules_table.selectionModel().selectionChanged.connect(self.update_rule_buttons)
     
+    def create_performance_tab(self):
+        tab = QWidget()
+        layout = QFormLayout(tab)
+        
+        self.scan_workers_spin = QSpinBox()
+        self.scan_workers_spin.setRange(0, 64)
+        self.scan_workers_spin.setValue(self.settings.get("scan_workers", 0))
+        self.scan_workers_spin.setSpecialValueText("Off (sequential)")
+        self.scan_workers_spin.setToolTip("Threads used to list subdirectories concurrently; helps on network drives")
+        
+        self.use_scan_cache_cb = QCheckBox("Reuse listings of unchanged directories from earlier runs")
+        self.use_scan_cache_cb.setChecked(self.settings.get("use_scan_cache", False))
+        clear_cache_btn = QPushButton("Clear Scan Cache")
+        clear_cache_btn.clicked.connect(self.clear_scan_cache)
+        
+        self.collect_stats_cb = QCheckBox("Show per-phase timings in the status bar")
+        self.collect_stats_cb.setChecked(self.settings.get("collect_stats", False))
+        self.collect_stats_cb.setToolTip("Times listing, filtering, sorting and formatting; slows generation down slightly")
+        
+        layout.addRow("Parallel Scan Threads:", self.scan_workers_spin)
+        layout.addRow("Scan Cache:", self.use_scan_cache_cb)
+        layout.addRow("", clear_cache_btn)
+        layout.addRow("Statistics:", self.collect_stats_cb)
+        
+        self.tabs.addTab(tab, "Performance")
+    
+    def clear_scan_cache(self):
+        from backend.scan_cache import clear_scan_cache
+        try:
+            clear_scan_cache()
+            QMessageBox.information(self, "Scan Cache", "The scan cache has been cleared.")
+        except OSError as e:
+            QMessageBox.warning(self, "Scan Cache", f"Could not clear the scan cache: {e}")
+    
     def add_excluded_folder(self):
         folder, ok = QInputDialog.getText(self, "Add Folder", "Folder name to exclude:")
         if ok and folder:
@@ -435,11 +510,20 @@ class SettingsDialog(QDialog):
                 "root_emoji": "🌐",
                 "subdir_emoji": "📁",
                 "extra_indent": 0,
+                "tree_style": "box",
+                "show_sizes": False,
+                "sort_mode": "name",
+                "sort_reverse": False,
+                "max_entries_per_dir": 0,
                 "exclude_folders": ["node_modules", ".git", "venv"],
                 "exclude_patterns": ["#", "~"],
                 "min_file_size": 0,
                 "max_file_size": "inf",
+                "use_ignore_files": False,
                 "directory_rules": [],
+                "scan_workers": 0,
+                "use_scan_cache": False,
+                "collect_stats": False,
                 "exclude_folders_in_dirs": {},
                 "exclude_files_in_dirs": {},
                 "only_show_files_with_specific_char_indir": {},
@@ -452,6 +536,11 @@ class SettingsDialog(QDialog):
             self.root_emoji_edit.setText("🌐")
             self.subdir_emoji_edit.setText("📁")
             self.extra_indent_spin.setValue(0)
+            self.tree_style_combo.setCurrentIndex(0)
+            self.show_sizes_cb.setChecked(False)
+            self.sort_mode_combo.setCurrentIndex(0)
+            self.sort_reverse_cb.setChecked(False)
+            self.max_entries_spin.setValue(0)
             
             self.folder_list.clear()
             for folder in self.settings["exclude_folders"]:
@@ -465,8 +554,12 @@ class SettingsDialog(QDialog):
             self.max_size_spin.setValue(1000000000)
             self.max_size_inf_cb.setChecked(True)
             self.max_size_spin.setEnabled(False)
+            self.use_ignore_files_cb.setChecked(False)
             
             self.load_directory_rules()
+            self.scan_workers_spin.setValue(0)
+            self.use_scan_cache_cb.setChecked(False)
+            self.collect_stats_cb.setChecked(False)
     
     def get_settings(self):
         # Save all rules as a list of dicts
@@ -486,6 +579,11 @@ class SettingsDialog(QDialog):
             "root_emoji": self.root_emoji_edit.text(),
             "subdir_emoji": self.subdir_emoji_edit.text(),
             "extra_indent": self.extra_indent_spin.value(),
+            "tree_style": self.tree_style_combo.currentData(),
+            "show_sizes": self.show_sizes_cb.isChecked(),
+            "sort_mode": self.sort_mode_combo.currentData(),
+            "sort_reverse": self.sort_reverse_cb.isChecked(),
+            "max_entries_per_dir": self.max_entries_spin.value(),
             "exclude_folders": [self.folder_list.item(i).text() 
                                for i in range(self.folder_list.count())],
             "exclude_patterns": [self.pattern_list.item(i).text() 
@@ -493,7 +591,11 @@ class SettingsDialog(QDialog):
             "min_file_size": self.min_size_spin.value(),
             "max_file_size": "inf" if self.max_size_inf_cb.isChecked() 
                             else str(self.max_size_spin.value()),
+            "use_ignore_files": self.use_ignore_files_cb.isChecked(),
             "directory_rules": directory_rules,
+            "scan_workers": self.scan_workers_spin.value(),
+            "use_scan_cache": self.use_scan_cache_cb.isChecked(),
+            "collect_stats": self.collect_stats_cb.isChecked(),
             "exclude_folders_in_dirs": {},
             "exclude_files_in_dirs": {},
             "only_show_files_with_specific_char_indir": {},
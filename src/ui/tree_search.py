@@ -0,0 +1,129 @@
+import re
+from array import array
+from bisect import bisect_right
+
+# Tree drawing before an entry's text, for every style in backend.generate_tree.TREE_STYLES:
+# indentation units ("│   ", "|   ", spaces) followed by an optional connector
+_PREFIX = re.compile(r"(?:[│| ]   |  )*(?:[├└]───|[|`]---|- )?")
+# Size annotation after a name (see TreeFormat): "(4.0 KB)" for files, "(45.4 KB, 31 files)" for folders
+_SIZE_SUFFIX = re.compile(r"  \((?:\d+(?:\.\d)? [KMGTP]?B|\?)(?:, [\d,]+ files?)?\)\Z")
+# Start of the summary line of a truncated directory ("… 1,995 more files")
+_SUMMARY = "…"
+
+class TreeSearchIndex:
+    """
+    Search index over the lines of a generated tree.
+
+    Lines are added in batches as they are generated. For each line the
+    index keeps its entry name (the line without the tree drawing, emoji and
+    size annotation, lowercased; empty for truncation summaries, so searches
+    only match names) in one newline-separated string table with an array of start
+    offsets, and the row of its parent: the closest earlier line that is
+    indented less. A search is then one substring scan of the table in C,
+    and every match's ancestors come from the parent array, so neither the
+    displayed text nor the disk is read again.
+    """
+    MAX_MATCHES = 5000
+
+    def __init__(self):
+        self._emoji = ()
+        self.clear()
+
+    def set_emoji(self, *emoji):
+        """Set the emoji the tree format puts before the root and folder names (see TreeConfig), kept out of the index."""
+        self._emoji = tuple(e for e in emoji if e)
+
+    def clear(self):
+        self._parts = []  # Lowercase entry texts, one "\n"-terminated string per batch
+        self._text = ""  # The parts joined, built on the first search after a change
+        self._starts = array("I")  # Offset of every line's text in the table
+        self._length = 0
+        self._parents = array("i")  # Parent row of every line, -1 for top-level lines
+        self._open_indents = []  # Indentation and row of the lines that can still get children
+        self._open_rows = []
+
+    def __len__(self):
+        return len(self._parents)
+
+    def add_lines(self, lines):
+        """Index the next batch of lines, in display order."""
+        match = _PREFIX.match
+        size_suffix = _SIZE_SUFFIX.search
+        emoji = self._emoji
+        starts = self._starts
+        parents = self._parents
+        open_indents = self._open_indents
+        open_rows = self._open_rows
+        row = len(parents)
+        length = self._length
+        texts = []
+        for line in lines:
+            indent = match(line).end()
+            text = line[indent:].strip()
+            if text.startswith(_SUMMARY):
+                text = ""
+            else:
+                if text.endswith(")"):
+                    suffix = size_suffix(text)
+                    if suffix is not None:
+                        text = text[:suffix.start()]
+                for decoration in emoji:
+                    if text.startswith(decoration):
+                        text = text[len(decoration):].lstrip()
+                        break
+                text = text.lower()
+            while open_indents and open_indents[-1] >= indent:
+                open_indents.pop()
+                open_rows.pop()
+            parents.append(open_rows[-1] if open_rows else -1)
+            open_indents.append(indent)
+            open_rows.append(row)
+            starts.append(length)
+            length += len(text) + 1
+            texts.append(text)
+            row += 1
+        self._length = length
+        if texts:
+            self._parts.append("\n".join(texts) + "\n")
+            self._text = None
+
+    def search(self, query, limit=MAX_MATCHES):
+        """
+        Find the lines whose entry text contains query (case-insensitive).
+
+        Args:
+            query (str): The text to look for
+            limit (int): Stop after this many matching lines
+
+        Returns:
+            tuple: (rows, matches, complete) where rows are the matching lines
+                and all their ancestors in display order, matches the matching
+                rows, and complete is False if the search stopped at limit
+        """
+        if self._text is None:
+            self._text = "".join(self._parts)
+            self._parts = [self._text]
+        text = self._text
+        starts = self._starts
+        query = query.lower()
+        find = text.find
+        matches = []
+        position = find(query) if query else -1
+        while position >= 0:
+            if len(matches) >= limit:
+                break
+            row = bisect_right(starts, position) - 1
+            matches.append(row)
+            # Continue from the next line, so each line counts once
+            next_start = starts[row + 1] if row + 1 < len(starts) else len(text)
+            position = find(query, next_start)
+        complete = position < 0
+
+        shown = set(matches)
+        parents = self._parents
+        for row in matches:
+            parent = parents[row]
+            while parent >= 0 and parent not in shown:
+                shown.add(parent)
+                parent = parents[parent]
+        return sorted(shown), matches, complete
@@ -0,0 +1,246 @@
+from array import array
+from bisect import bisect_right
+from PySide6.QtCore import QAbstractListModel, QModelIndex, QSize, Qt, Signal
+from PySide6.QtGui import QBrush, QColor, QFontMetrics, QKeySequence
+from PySide6.QtWidgets import QAbstractItemView, QApplication, QListView
+from ui.tree_search import TreeSearchIndex
+
+class TreeLinesModel(QAbstractListModel):
+    """
+    List model holding the generated tree lines.
+
+    Lines are stored as the UTF-8 batches they arrived in, with an array of
+    line start offsets per batch, so memory stays close to the size of the
+    text itself. A line is only decoded when the view asks for it, which for
+    a list view means only the rows currently on screen.
+
+    Each batch is also added to search_index as it arrives, so searching
+    (see search()) never goes back to the stored text.
+    """
+    width_grew = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._chunks = []  # UTF-8 batches, lines joined with b"\n"
+        self._offsets = []  # Per batch: array of line start offsets plus an end sentinel
+        self._first_rows = []  # Row number of the first line of each batch
+        self._row_count = 0
+        self._max_chars = 0
+        self._char_width = 8
+        self._line_height = 16
+        self.search_index = TreeSearchIndex()
+        self._index_stale = False  # Set by live updates, which shift rows
+
+    def set_font_metrics(self, metrics):
+        """Use the view's font to size rows without measuring every line."""
+        self._char_width = max(metrics.horizontalAdvance("M"), 1)
+        self._line_height = metrics.height()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._row_count
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self.line(index.row())
+        if role == Qt.SizeHintRole:
+            # Rows have a uniform size, wide enough for the longest line (plus room for emoji)
+            return QSize((self._max_chars + 4) * self._char_width, self._line_height)
+        return None
+
+    def line(self, row):
+        """Decode and return a single line."""
+        chunk_index = bisect_right(self._first_rows, row) - 1
+        offsets = self._offsets[chunk_index]
+        local_row = row - self._first_rows[chunk_index]
+        start = offsets[local_row]
+        end = offsets[local_row + 1] - 1
+        return self._chunks[chunk_index][start:end].decode("utf-8")
+
+    def append_text(self, text):
+        """Append a batch of lines joined with "\n" (as sent by TreeWorker)."""
+        lines = text.split("\n")
+        # Encoded before the insert starts, so nothing can fail between begin and end
+        data, offsets = _encode_batch(text)
+        first_row = self._row_count
+        self.beginInsertRows(QModelIndex(), first_row, first_row + len(lines) - 1)
+        self._chunks.append(data)
+        self._offsets.append(offsets)
+        self._first_rows.append(first_row)
+        self._row_count += len(lines)
+        self.endInsertRows()
+        if not self._index_stale:
+            self.search_index.add_lines(lines)
+        self._track_width(lines)
+
+    def replace_lines(self, start, removed_count, lines):
+        """Replace removed_count rows at start with lines (used for live updates)."""
+        self._index_stale = True
+        if removed_count:
+            self.beginRemoveRows(QModelIndex(), start, start + removed_count - 1)
+            self._splice(start, removed_count, [])
+            self.endRemoveRows()
+        if lines:
+            self.beginInsertRows(QModelIndex(), start, start + len(lines) - 1)
+            self._splice(start, 0, lines)
+            self.endInsertRows()
+            self._track_width(lines)
+
+    def _splice(self, start, removed_count, lines):
+        # Merge the batches covering the affected rows into a single re-encoded batch
+        if self._chunks:
+            first = max(bisect_right(self._first_rows, start) - 1, 0)
+            last = max(bisect_right(self._first_rows, start + max(removed_count - 1, 0)) - 1, first)
+            merged = []
+            for chunk in self._chunks[first:last + 1]:
+                merged.extend(chunk.decode("utf-8").split("\n"))
+            local_start = start - self._first_rows[first]
+            merged[local_start:local_start + removed_count] = lines
+            del self._chunks[first:last + 1]
+            del self._offsets[first:last + 1]
+            if merged:
+                data, offsets = _encode_batch("\n".join(merged))
+                self._chunks.insert(first, data)
+                self._offsets.insert(first, offsets)
+        elif lines:
+            data, offsets = _encode_batch("\n".join(lines))
+            self._chunks.append(data)
+            self._offsets.append(offsets)
+        self._first_rows = []
+        row = 0
+        for offsets in self._offsets:
+            self._first_rows.append(row)
+            row += len(offsets) - 1
+        self._row_count = row
+
+    def _track_width(self, lines):
+        longest = max(map(len, lines))
+        if longest > self._max_chars:
+            self._max_chars = longest
+            self.width_grew.emit()
+
+    def clear(self):
+        self.beginResetModel()
+        self._chunks = []
+        self._offsets = []
+        self._first_rows = []
+        self._row_count = 0
+        self._max_chars = 0
+        self.search_index.clear()
+        self._index_stale = False
+        self.endResetModel()
+
+    def search(self, query):
+        """
+        Search the tree lines for query (see TreeSearchIndex.search).
+
+        The index is rebuilt from the stored batches first if live updates
+        changed the lines since it was built.
+        """
+        if self._index_stale:
+            self.search_index.clear()
+            for chunk in self._chunks:
+                self.search_index.add_lines(chunk.decode("utf-8").split("\n"))
+            self._index_stale = False
+        return self.search_index.search(query)
+
+    def text(self):
+        """Return the whole tree as a string, one line per row with a trailing newline."""
+        return "".join(chunk.decode("utf-8") + "\n" for chunk in self._chunks)
+
+    def write_to(self, binary_file):
+        """Write the whole tree as UTF-8, straight from the stored batches."""
+        for chunk in self._chunks:
+            binary_file.write(chunk)
+            binary_file.write(b"\n")
+
+def _encode_batch(text):
+    # UTF-8 bytes of the batch plus the start offset of every line and an end sentinel;
+    # names that are not valid UTF-8 (surrogate-escaped) are stored as "?", as in saved files
+    data = text.encode("utf-8", errors="replace")
+    offsets = array("I", [0])
+    position = 0
+    for encoded in data.split(b"\n"):
+        position += len(encoded) + 1
+        offsets.append(position)
+    return data, offsets
+
+class FilteredLinesModel(QAbstractListModel):
+    """
+    A subset of the rows of a TreeLinesModel, as shown for a search.
+
+    Rows listed in matches are highlighted; the others are the ancestors
+    that keep the matches in context.
+    """
+    MATCH_BACKGROUND = QColor(255, 226, 120)
+    MATCH_FOREGROUND = QColor(0, 0, 0)
+
+    def __init__(self, source, rows, matches, parent=None):
+        super().__init__(parent)
+        self._source = source
+        self._rows = array("I", rows)
+        self._matches = set(matches)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        if role == Qt.BackgroundRole:
+            return QBrush(self.MATCH_BACKGROUND) if row in self._matches else None
+        if role == Qt.ForegroundRole:
+            return QBrush(self.MATCH_FOREGROUND) if row in self._matches else None
+        return self._source.data(self._source.index(row), role)
+
+    def line(self, row):
+        """Decode and return a single line."""
+        return self._source.line(self._rows[row])
+
+class TreeOutputView(QListView):
+    """
+    Read-only view for the tree output that only lays out visible lines.
+
+    show_search_results() narrows it to a search's rows until clear_search().
+    Ctrl+C copies the selected lines.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tree_model = TreeLinesModel(self)
+        self.setModel(self.tree_model)
+        self.setUniformItemSizes(True)
+        self.setWordWrap(False)
+        self.setTextElideMode(Qt.ElideNone)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.tree_model.width_grew.connect(self.doItemsLayout)
+
+    def show_search_results(self, rows, matches):
+        """Show only rows, highlighting matches (as returned by TreeLinesModel.search)."""
+        old_model = self.model()
+        self.setModel(FilteredLinesModel(self.tree_model, rows, matches, self))
+        if old_model is not self.tree_model:
+            old_model.deleteLater()
+
+    def clear_search(self):
+        """Show the whole tree again."""
+        old_model = self.model()
+        if old_model is not self.tree_model:
+            self.setModel(self.tree_model)
+            old_model.deleteLater()
+
+    def setFont(self, font):
+        super().setFont(font)
+        self.tree_model.set_font_metrics(QFontMetrics(font))
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Copy):
+            rows = sorted(index.row() for index in self.selectionModel().selectedRows())
+            if rows:
+                QApplication.clipboard().setText("\n".join(self.model().line(row) for row in rows))
+            return
+        super().keyPressEvent(event)
@@ -0,0 +1,124 @@
+import time
+from PySide6.QtCore import QThread, Signal
+from backend.generate_tree import TreeStats, iter_tree_lines
+
+class TreeWorker(QThread):
+    """
+    Runs tree generation off the GUI thread.
+
+    Lines from iter_tree_lines are collected into batches and sent to the GUI
+    every BATCH_INTERVAL seconds (or every BATCH_MAX_LINES lines), together with
+    the entry count and throughput. cancel() stops the traversal at the next
+    line it produces (or, while size rollups are totalled, at the next directory).
+
+    With live=True the tree is built as a LiveTree, which is handed over via
+    live_tree_ready once generation completes so it can be watched for changes.
+    Otherwise listings are read from scan (a RetainedScan) when one is given,
+    and with collect_stats=True per-phase timings and counters are collected
+    in self.stats (timing every line has a cost, so it is off by default).
+    """
+    lines_ready = Signal(str)  # A batch of lines joined with "\n"
+    progress = Signal(int, float)  # Entries so far, entries per second
+    rollup_progress = Signal(int)  # Entries totalled so far, before the first line when sizes are rolled up
+    completed = Signal(int, float)  # Total entries, elapsed seconds
+    cancelled = Signal(int)  # Entries produced before the cancel
+    failed = Signal(str)  # Error message
+    live_tree_ready = Signal(object)  # The LiveTree, in live mode
+
+    BATCH_INTERVAL = 0.1
+    BATCH_MAX_LINES = 5000
+
+    def __init__(self, root_dir, config=None, live=False, scan=None, collect_stats=False, parent=None):
+        super().__init__(parent)
+        self.root_dir = root_dir
+        self.config = config
+        self.live = live
+        self.scan = scan
+        self.live_tree = None
+        self.stats = TreeStats() if collect_stats and not live else None
+        self._cancel_requested = False
+
+    def cancel(self):
+        self._cancel_requested = True
+
+    def run(self):
+        start = time.perf_counter()
+        last_emit = start
+        count = 0
+        batch = []
+        if self.live:
+            lines = self._iter_live_lines()
+        else:
+            lines = iter_tree_lines(self.root_dir, self.config, self.stats, self.scan,
+                                    should_stop=lambda: self._cancel_requested,
+                                    rollup_progress=self.rollup_progress.emit)
+        try:
+            for line in lines:
+                if self._cancel_requested:
+                    break
+                batch.append(line)
+                count += 1
+                # Only look at the clock every 256 lines to keep the loop cheap
+                if len(batch) >= self.BATCH_MAX_LINES or not count & 255:
+                    now = time.perf_counter()
+                    if len(batch) >= self.BATCH_MAX_LINES or now - last_emit >= self.BATCH_INTERVAL:
+                        self._flush(batch, count, now - start)
+                        batch = []
+                        last_emit = now
+        except Exception as e:
+            self._flush(batch, count, time.perf_counter() - start)
+            self.failed.emit(str(e))
+            return
+        finally:
+            # Stops any parallel scan threads still running ahead of the output
+            lines.close()
+
+        elapsed = time.perf_counter() - start
+        self._flush(batch, count, elapsed)
+        # The root line is not an entry
+        entries = max(count - 1, 0)
+        if self._cancel_requested:
+            self.cancelled.emit(entries)
+        else:
+            self.completed.emit(entries, elapsed)
+            if self.live_tree is not None:
+                self.live_tree_ready.emit(self.live_tree)
+
+    def _iter_live_lines(self):
+        from backend.watch import LiveTree
+        tree = LiveTree(self.root_dir, self.config)
+        if not tree.build(should_stop=lambda: self._cancel_requested):
+            return
+        yield from tree.iter_lines()
+        self.live_tree = tree
+
+    def _flush(self, batch, count, elapsed):
+        if batch:
+            self.lines_ready.emit("\n".join(batch))
+        entries = max(count - 1, 0)
+        self.progress.emit(entries, entries / elapsed if elapsed > 0 else 0.0)
+
+class ExportWorker(QThread):
+    """
+    Streams a machine-readable export (see backend.export) to a file off the GUI thread.
+    """
+    completed = Signal(int, float)  # Records written, elapsed seconds
+    failed = Signal(str)  # Error message
+
+    def __init__(self, root_dir, output_file, export_format, config=None, scan=None, parent=None):
+        super().__init__(parent)
+        self.root_dir = root_dir
+        self.output_file = output_file
+        self.export_format = export_format
+        self.config = config
+        self.scan = scan
+
+    def run(self):
+        from backend.export import export_tree
+        start = time.perf_counter()
+        try:
+            count = export_tree(self.root_dir, self.output_file, self.export_format, self.config, scan=self.scan)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.completed.emit(count, time.perf_counter() - start)
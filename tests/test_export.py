@@ -0,0 +1,36 @@
+import csv
+import json
+import os
+import sys
+import pytest
+from backend.export import export_tree
+from backend.generate_tree import TreeConfig
+
+@pytest.fixture
+def tree_with_bad_name(tmp_path):
+    # A name that is not valid UTF-8 reaches Python surrogate-escaped
+    try:
+        with open(os.path.join(os.fsencode(tmp_path), b"bad\xff.txt"), "wb") as f:
+            f.write(b"x")
+    except (OSError, ValueError):
+        pytest.skip("the file system does not accept names that are not valid UTF-8")
+    (tmp_path / "ok.txt").write_text("ok")
+    return tmp_path
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Windows file names are always Unicode")
+@pytest.mark.parametrize("export_format", ["ndjson", "csv", "json", "text"])
+def test_export_writes_names_that_are_not_utf8(tree_with_bad_name, tmp_path_factory, export_format):
+    output = tmp_path_factory.mktemp("out") / f"tree.{export_format}"
+    export_tree(str(tree_with_bad_name), str(output), export_format, TreeConfig())
+
+    text = output.read_text(encoding="utf-8")
+    assert "bad?.txt" in text
+    assert "ok.txt" in text
+    if export_format == "ndjson":
+        paths = [json.loads(line)["path"] for line in text.splitlines()]
+        assert "bad?.txt" in paths
+    elif export_format == "csv":
+        paths = [row["path"] for row in csv.DictReader(text.splitlines())]
+        assert "bad?.txt" in paths
+    elif export_format == "json":
+        json.loads(text)
@@ -0,0 +1,46 @@
+from backend.generate_tree import TreeConfig, TreeStats, iter_tree_lines, scan_directory
+from backend.retained_scan import RetainedScan
+
+def _make_tree(root):
+    (root / "src").mkdir()
+    (root / "src" / "main.py").write_text("print()\n")
+    (root / "src" / "build").mkdir()
+    (root / "src" / "build" / "out.bin").write_bytes(b"0" * 100)
+    (root / "README.md").write_text("readme\n")
+    (root / ".gitignore").write_text("build/\n")
+
+def test_second_run_reads_nothing_from_disk(tmp_path, monkeypatch):
+    import backend.generate_tree
+    _make_tree(tmp_path)
+    config = TreeConfig(tree_depth=-1, sort_mode="mtime")
+    expected = list(iter_tree_lines(str(tmp_path), config))
+    listed = []
+
+    def counting(path):
+        listed.append(path)
+        return scan_directory(path)
+
+    monkeypatch.setattr(backend.generate_tree, "scan_directory", counting)
+    scan = RetainedScan(str(tmp_path))
+    first = list(iter_tree_lines(str(tmp_path), config, scan=scan))
+    stats = TreeStats()
+    second = list(iter_tree_lines(str(tmp_path), config, stats, scan=scan))
+
+    assert first == second == expected
+    assert len(listed) == 3
+    # Modification times fetched by the first run are kept too
+    assert stats.stat_calls == 0
+
+def test_ignore_files_are_parsed_once(tmp_path, monkeypatch):
+    import backend.ignore_files
+    _make_tree(tmp_path)
+    config = TreeConfig(tree_depth=-1, use_ignore_files=True)
+    scan = RetainedScan(str(tmp_path))
+    first = list(iter_tree_lines(str(tmp_path), config, scan=scan))
+
+    def fail(directory, file_names):
+        raise AssertionError(f"ignore files of {directory} read again")
+
+    monkeypatch.setattr(backend.ignore_files, "load_ignore_rules", fail)
+    assert list(iter_tree_lines(str(tmp_path), config, scan=scan)) == first
+    assert not any("build" in line for line in first)
@@ -0,0 +1,30 @@
+import os
+import pytest
+from backend.generate_tree import TreeConfig, iter_tree_lines
+
+SIZES = TreeConfig(tree_depth=-1, show_sizes=True, size_rollups=True, root_emoji="", subdir_emoji="")
+
+@pytest.fixture
+def tree_with_hard_link(tmp_path):
+    for i in range(30):
+        (tmp_path / f"file{i:02}.txt").write_bytes(b"abcd")
+    (tmp_path / "sub").mkdir()
+    try:
+        os.link(tmp_path / "file00.txt", tmp_path / "sub" / "link.txt")
+    except (OSError, NotImplementedError):
+        pytest.skip("the file system does not support hard links")
+    return tmp_path
+
+def test_hard_link_is_counted_once(tree_with_hard_link):
+    lines = list(iter_tree_lines(str(tree_with_hard_link), SIZES))
+
+    assert lines[0].endswith("(120 B, 30 files)")
+    # The link is listed where it is, but its data was already counted above
+    assert any(line.endswith("link.txt  (4 B)") for line in lines)
+
+def test_hard_link_to_a_file_outside_the_tree_is_counted(tree_with_hard_link):
+    sub = tree_with_hard_link / "sub"
+    os.link(sub / "link.txt", sub / "second.txt")
+    lines = list(iter_tree_lines(str(sub), SIZES))
+
+    assert lines[0].endswith("(4 B, 1 file)")
@@ -0,0 +1,25 @@
+from backend.generate_tree import TreeConfig, TreeStats, iter_tree_lines
+
+PLAIN = dict(root_emoji="", subdir_emoji="", tree_style="indent")
+
+def _make_files(root):
+    # Sizes grow with the name, so size order is the reverse of name order
+    for i in range(20):
+        (root / f"f{i:02}.txt").write_bytes(b"x" * i)
+
+def test_size_order_without_truncation_sorts_every_file(tmp_path):
+    _make_files(tmp_path)
+    lines = list(iter_tree_lines(str(tmp_path), TreeConfig(sort_mode="size", **PLAIN)))
+
+    assert [line.strip() for line in lines[1:4]] == ["f19.txt", "f18.txt", "f17.txt"]
+
+def test_truncated_size_order_only_stats_shown_files(tmp_path):
+    _make_files(tmp_path)
+    stats = TreeStats()
+    config = TreeConfig(sort_mode="size", max_entries_per_dir=3, **PLAIN)
+    lines = list(iter_tree_lines(str(tmp_path), config, stats))
+
+    # The first three by name, largest first, then the summary
+    assert [line.strip() for line in lines[1:4]] == ["f02.txt", "f01.txt", "f00.txt"]
+    assert "17 more files" in lines[4]
+    assert stats.stat_calls == 3
@@ -0,0 +1,34 @@
+from backend.generate_tree import TreeConfig, iter_tree_lines
+from ui.tree_search import TreeSearchIndex
+
+def _index(root, config):
+    lines = list(iter_tree_lines(str(root), config))
+    index = TreeSearchIndex()
+    index.set_emoji(config.root_emoji, config.subdir_emoji)
+    index.add_lines(lines)
+    return lines, index
+
+def test_search_matches_names_not_decorations(tmp_path):
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "guide.md").write_text("x" * 2000)
+    (tmp_path / "kb").mkdir()
+    for i in range(4):
+        (tmp_path / f"file{i}.txt").write_text("x")
+    config = TreeConfig(tree_depth=-1, show_sizes=True, size_rollups=True, max_entries_per_dir=4)
+    lines, index = _index(tmp_path, config)
+
+    rows, matches, complete = index.search("KB")
+    assert [lines[row] for row in matches] == [line for line in lines if "📁kb" in line]
+    assert complete
+    # Neither the size annotations nor the truncation summary match
+    assert index.search("files")[1] == []
+    assert index.search("📁")[1] == []
+
+def test_search_returns_ancestors_of_matches(tmp_path):
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "guide.md").write_text("guide")
+    lines, index = _index(tmp_path, TreeConfig(tree_depth=-1))
+
+    rows, matches, _ = index.search("guide")
+    assert [lines[row].strip("├└│─ ") for row in rows] == [lines[0], "📁docs", "guide.md"]
+    assert matches == [rows[-1]]